@@ -0,0 +1,162 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from dotenv import load_dotenv
+from .ai_service import ai_analyst
+from .market_hours import is_market_open
+
+load_dotenv()
+
+MARKET_KEY = "market"
+
+
+class AIRefresher:
+    """Serves the AI market summary and per-symbol analyses from memory, refreshed in the background.
+
+    Requests are counted per symbol with exponential decay (``half_life`` seconds); the
+    market summary and the ``top_n`` symbols scoring at least ``min_score`` are recomputed
+    every ``open_interval`` seconds while the market is open and every ``closed_interval``
+    otherwise. A request for an entry older than the interval still gets the stored result
+    (up to twice the interval old) while a refresh runs; anything older or missing is
+    computed inline. Concurrent refreshes of one entry share a single computation.
+    """
+
+    def __init__(self, top_n: int = 10, open_interval: float = 300, closed_interval: float = 3600,
+                 half_life: float = 3600, min_score: float = 1.0, concurrency: int = 2):
+        self.top_n = top_n
+        self.open_interval = open_interval
+        self.closed_interval = closed_interval
+        self.half_life = half_life
+        self.min_score = min_score
+        self.concurrency = concurrency
+        self._scores: Dict[str, Tuple[float, float]] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._metrics = {"fresh_hits": 0, "stale_hits": 0, "inline": 0, "refreshes": 0, "failures": 0}
+
+    # -- popularity --------------------------------------------------------
+
+    def _score(self, key: str, now: float) -> float:
+        score, updated = self._scores.get(key, (0.0, now))
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def record(self, key: str):
+        now = time.time()
+        self._scores[key] = (self._score(key, now) + 1, now)
+
+    def hot_symbols(self) -> List[str]:
+        now = time.time()
+        scored = [(self._score(key, now), key) for key in self._scores if key != MARKET_KEY]
+        hot = sorted((item for item in scored if item[0] >= self.min_score), reverse=True)
+        return [key for _, key in hot[:self.top_n]]
+
+    def interval(self) -> float:
+        return self.open_interval if is_market_open() else self.closed_interval
+
+    # -- entries -----------------------------------------------------------
+
+    def _refresh(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> asyncio.Task:
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return task
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self._metrics["refreshes"] += 1
+        try:
+            result = await compute()
+        except Exception as e:
+            result = {"error": str(e)}
+        if "error" in result:
+            self._metrics["failures"] += 1
+            return result
+        entry = {"result": result, "computed_at": time.time()}
+        self._entries[key] = entry
+        return self._with_age(entry)
+
+    @staticmethod
+    def _with_age(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **entry["result"],
+            "generated_at": datetime.fromtimestamp(entry["computed_at"]).astimezone().isoformat(),
+            "age_seconds": round(time.time() - entry["computed_at"])
+        }
+
+    async def _serve(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.record(key)
+        entry = self._entries.get(key)
+        interval = self.interval()
+        age = time.time() - entry["computed_at"] if entry else None
+
+        if entry is not None and age < interval:
+            self._metrics["fresh_hits"] += 1
+            return self._with_age(entry)
+        if entry is not None and age < 2 * interval:
+            self._metrics["stale_hits"] += 1
+            self._refresh(key, compute)
+            return self._with_age(entry)
+
+        self._metrics["inline"] += 1
+        return await asyncio.shield(self._refresh(key, compute))
+
+    async def market_summary(self) -> Dict[str, Any]:
+        return await self._serve(MARKET_KEY, ai_analyst.generate_market_summary)
+
+    async def stock_analysis(self, symbol: str) -> Dict[str, Any]:
+        symbol = symbol.strip().upper()
+        return await self._serve(symbol, lambda: ai_analyst.generate_stock_recommendation(symbol))
+
+    # -- background --------------------------------------------------------
+
+    async def refresh_due(self):
+        """Recompute the market summary and hot symbols whose entries are older than the interval.
+
+        Entries for symbols that are no longer hot are dropped once they are too old to serve.
+        """
+        now = time.time()
+        interval = self.interval()
+        hot = self.hot_symbols()
+        targets: List[Tuple[str, Callable[[], Awaitable[Dict[str, Any]]]]] = []
+        if self._score(MARKET_KEY, now) >= self.min_score:
+            targets.append((MARKET_KEY, ai_analyst.generate_market_summary))
+        targets += [(symbol, lambda s=symbol: ai_analyst.generate_stock_recommendation(s)) for symbol in hot]
+
+        for key in [k for k, e in self._entries.items() if k not in hot and k != MARKET_KEY
+                    and now - e["computed_at"] >= 2 * interval]:
+            del self._entries[key]
+        for key in [k for k in self._scores if self._score(k, now) < 0.01]:
+            del self._scores[key]
+
+        due = [(key, compute) for key, compute in targets
+               if key not in self._entries or now - self._entries[key]["computed_at"] >= interval]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(key, compute):
+            async with semaphore:
+                await self._refresh(key, compute)
+
+        await asyncio.gather(*(refresh(key, compute) for key, compute in due))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            **self._metrics,
+            "interval_seconds": self.interval(),
+            "hot_symbols": self.hot_symbols(),
+            "entries": {key: round(now - entry["computed_at"]) for key, entry in self._entries.items()},
+            "refreshing": list(self._refreshing)
+        }
+
+
+ai_refresher = AIRefresher(
+    top_n=int(os.getenv("AI_REFRESH_TOP_N", "10")),
+    open_interval=float(os.getenv("AI_REFRESH_INTERVAL_OPEN", "300")),
+    closed_interval=float(os.getenv("AI_REFRESH_INTERVAL_CLOSED", "3600")),
+    half_life=float(os.getenv("AI_REFRESH_HALF_LIFE", "3600")),
+    min_score=float(os.getenv("AI_REFRESH_MIN_SCORE", "1.0")),
+    concurrency=int(os.getenv("AI_REFRESH_CONCURRENCY", "2"))
+)
@@ -1,8 +1,14 @@
 import os
-from openai import OpenAI
-from typing import List, Dict, Any, Optional
+import asyncio
+from openai import AsyncOpenAI
+from typing import List, Dict, Any, Optional, Awaitable, AsyncIterator, Tuple
 from dotenv import load_dotenv
-from .mcp_tools import mcp_tools
+from .async_tools import async_tools
+from .cache import is_error_result
+from .llm_cache import llm_cache
+from .token_budget import chat_budget
+from .chat_sessions import ChatSession
+from .tool_memo import ToolMemo
 import json
 
 load_dotenv()
@@ -12,8 +18,25 @@ class AIStockAnalyst:
     """AI-powered stock analyst using OpenAI API with MCP tools."""
     
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=float(os.getenv("OPENAI_TIMEOUT", "60"))
+        )
         self.model = "gpt-4o"
+        self.llm_semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")))
+        self.max_tool_concurrency = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+        self.tool_timeout = float(os.getenv("TOOL_TIMEOUT", "20"))
+        self.source_timeout = float(os.getenv("DATA_SOURCE_TIMEOUT", "15"))
+        self.tool_functions = {
+            "get_stock_info": async_tools.get_stock_info,
+            "get_historical_data": async_tools.get_historical_data,
+            "get_stock_news": async_tools.get_stock_news,
+            "analyze_stock_technicals": async_tools.analyze_stock_technicals,
+            "get_market_indices": async_tools.get_market_indices,
+            "get_top_movers": async_tools.get_top_movers,
+            "get_recommendations": async_tools.get_recommendations,
+            "get_financials": async_tools.get_financials,
+        }
         
         self.system_prompt = """You are an expert AI stock analyst with deep knowledge of financial markets, 
 technical analysis, fundamental analysis, and market trends. You have access to real-time stock data 
@@ -181,93 +204,308 @@ Format your responses clearly with sections for:
             }
         ]
 
-    def _execute_tool(self, tool_name: str, arguments: Dict) -> Any:
+    async def _complete(self, **kwargs):
+        """Create a chat completion, bounded by the configured OpenAI concurrency limit."""
+        async with self.llm_semaphore:
+            return await self.client.chat.completions.create(model=self.model, **kwargs)
+
+    async def _read_stream(self, messages: List[Dict], chunks: asyncio.Queue):
+        """Relay one streamed completion into ``chunks``, ending with ``None``.
+
+        The concurrency slot is held only while the model is producing; a slow client
+        drains the queue afterwards without keeping other requests waiting.
+        """
+        try:
+            async with self.llm_semaphore:
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    tools=self.tools,
+                    tool_choice="auto",
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                async for chunk in stream:
+                    chunks.put_nowait(chunk)
+        finally:
+            chunks.put_nowait(None)
+
+    async def _cached_completion(self, kind: str, payload: Any, prompt: str) -> Tuple[str, bool]:
+        """Completion text for ``prompt``, reused while the data it embeds (``payload``) is unchanged."""
+        key = llm_cache.fingerprint(self.model, self.system_prompt, kind, payload)
+
+        async def create() -> str:
+            response = await self._complete(
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            return response.choices[0].message.content
+
+        return await llm_cache.get_or_create(key, kind, create)
+
+    async def _execute_tool(self, tool_name: str, arguments: Dict) -> Any:
         """Execute a tool and return the result."""
-        tool_map = {
-            "get_stock_info": mcp_tools.get_stock_info,
-            "get_historical_data": mcp_tools.get_historical_data,
-            "get_stock_news": mcp_tools.get_stock_news,
-            "analyze_stock_technicals": mcp_tools.analyze_stock_technicals,
-            "get_market_indices": mcp_tools.get_market_indices,
-            "get_top_movers": mcp_tools.get_top_movers,
-            "get_recommendations": mcp_tools.get_recommendations,
-            "get_financials": mcp_tools.get_financials,
-        }
-        
-        if tool_name in tool_map:
-            return tool_map[tool_name](**arguments)
+        if tool_name in self.tool_functions:
+            return await self.tool_functions[tool_name](**arguments)
         return {"error": f"Unknown tool: {tool_name}"}
 
-    async def chat(self, message: str, symbol: Optional[str] = None, 
-                   conversation_history: List[Dict] = None) -> Dict[str, Any]:
-        """Process a chat message and return AI response with tool results."""
+    async def _run_tool_call(self, tool_name: str, raw_arguments: str, semaphore: asyncio.Semaphore,
+                             memo: ToolMemo) -> Tuple[Any, Dict[str, Any], bool]:
+        """Execute one model-requested tool call under the request's concurrency cap and timeout.
+
+        A live result in ``memo`` for the same tool and canonical arguments is reused.
+        Returns the result, the parsed arguments and whether the result was reused.
+        """
+        try:
+            arguments = json.loads(raw_arguments or "{}")
+        except json.JSONDecodeError as e:
+            return {"error": f"Invalid arguments for {tool_name}: {str(e)}"}, {}, False
+        
+        async def call() -> Any:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self._execute_tool(tool_name, arguments), timeout=self.tool_timeout)
+                except asyncio.TimeoutError:
+                    return {"error": f"{tool_name} timed out after {self.tool_timeout:g}s"}
+                except Exception as e:
+                    return {"error": f"{tool_name} failed: {str(e)}"}
         
+        func = self.tool_functions.get(tool_name)
+        if func is None:
+            return await call(), arguments, False
+        try:
+            key = memo.key(tool_name, func, arguments)
+            hash(key)
+        except TypeError:  # unhashable arguments; just run the call
+            return await call(), arguments, False
+        result, reused = await memo.run(key, call)
+        return result, arguments, reused
+
+    def _build_messages(self, message: str, symbol: Optional[str],
+                        conversation_history: Optional[List[Dict]],
+                        session: Optional[ChatSession] = None) -> Tuple[List[Dict], int]:
+        """Assemble the prompt for a chat turn, condensing history beyond the token budget.
+
+        A session's history is used as stored: ``add_turn`` already folds old turns into
+        its summary, and re-fitting would rewrite that summary and the prompt prefix.
+        Returns the messages and how many history turns were condensed.
+        """
         messages = [{"role": "system", "content": self.system_prompt}]
+        condensed = 0
         
-        if conversation_history:
-            messages.extend(conversation_history)
+        if session is not None:
+            messages.extend(session.history())
+        elif conversation_history:
+            history, condensed = chat_budget.fit_history(conversation_history)
+            messages.extend(history)
         
-        user_message = message
-        if symbol:
-            user_message = f"[Regarding {symbol}] {message}"
+        messages.append({"role": "user", "content": self._user_content(message, symbol)})
+        return messages, condensed
+
+    @staticmethod
+    def _user_content(message: str, symbol: Optional[str]) -> str:
+        return f"[Regarding {symbol}] {message}" if symbol else message
+
+    async def chat_stream(self, message: str, symbol: Optional[str] = None,
+                          conversation_history: List[Dict] = None,
+                          session: Optional[ChatSession] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Process a chat message, yielding progress events as the tool loop runs.
+
+        Emits ``tool_start``/``tool_end`` around each tool call and ``token`` for each
+        fragment of model output, then a final ``done`` (or ``error``) event carrying
+        the complete response, tool results and token usage.
+
+        With a ``session`` the history comes from (and the new turn is stored in) the
+        session, and ``conversation_history`` is ignored; turns in one session are serialized.
+        """
+        # Closed explicitly so a client disconnect cancels the turn's model and tool work now.
+        if session is None:
+            events = self._chat_events(message, symbol, conversation_history)
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+            return
         
-        messages.append({"role": "user", "content": user_message})
+        async with session.lock:
+            events = self._chat_events(message, symbol, None, session)
+            try:
+                async for event in events:
+                    if event["event"] == "done":
+                        session.add_turn(self._user_content(message, symbol), event["data"]["response"])
+                    if event["event"] in ("done", "error"):
+                        event["data"]["session_id"] = session.id
+                    yield event
+            finally:
+                await events.aclose()
+
+    async def _chat_events(self, message: str, symbol: Optional[str], conversation_history: Optional[List[Dict]],
+                           session: Optional[ChatSession] = None) -> AsyncIterator[Dict[str, Any]]:
+        messages, condensed = self._build_messages(message, symbol, conversation_history, session)
+        current_turn = len(messages) - 1
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "estimated_prompt_tokens": 0,
+                 "model_calls": 0, "tool_calls": 0, "reused_tool_calls": 0,
+                 "condensed_turns": condensed, "counter": chat_budget.counter}
+        tool_results: Dict[str, List[Dict[str, Any]]] = {}
+        memo = session.tools if session is not None else ToolMemo()
+        tool_semaphore = asyncio.Semaphore(self.max_tool_concurrency)
+        # Work started for this request; cancelled if the client goes away mid-stream.
+        tasks: List[asyncio.Task] = []
+        # Text from every model call, including any written before a round of tool calls.
+        response_parts: List[str] = []
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=self.tools,
-                tool_choice="auto"
-            )
-            
-            assistant_message = response.choices[0].message
-            tool_results = {}
-            
-            while assistant_message.tool_calls:
-                messages.append(assistant_message)
+            while True:
+                content_parts = []
+                pending_calls: Dict[int, Dict[str, Any]] = {}
                 
-                for tool_call in assistant_message.tool_calls:
-                    tool_name = tool_call.function.name
-                    arguments = json.loads(tool_call.function.arguments)
-                    
-                    result = self._execute_tool(tool_name, arguments)
-                    tool_results[tool_name] = result
+                prompt_tokens, dropped = chat_budget.enforce(messages, current_turn)
+                current_turn -= dropped
+                usage["estimated_prompt_tokens"] += prompt_tokens
+                usage["model_calls"] += 1
+                
+                chunks: asyncio.Queue = asyncio.Queue()
+                reader = asyncio.create_task(self._read_stream(messages, chunks))
+                tasks.append(reader)
+                while (chunk := await chunks.get()) is not None:
+                    if chunk.usage:
+                        usage["prompt_tokens"] += chunk.usage.prompt_tokens
+                        usage["completion_tokens"] += chunk.usage.completion_tokens
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        content_parts.append(delta.content)
+                        response_parts.append(delta.content)
+                        yield {"event": "token", "data": {"content": delta.content}}
+                    for fragment in delta.tool_calls or []:
+                        call = pending_calls.setdefault(fragment.index, {
+                            "id": "",
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""}
+                        })
+                        if fragment.id:
+                            call["id"] = fragment.id
+                        if fragment.function and fragment.function.name:
+                            call["function"]["name"] += fragment.function.name
+                        if fragment.function and fragment.function.arguments:
+                            call["function"]["arguments"] += fragment.function.arguments
+                await reader  # re-raises an upstream failure
+                
+                if not pending_calls:
+                    break
+                
+                tool_calls = [pending_calls[index] for index in sorted(pending_calls)]
+                messages.append({
+                    "role": "assistant",
+                    "content": "".join(content_parts) or None,
+                    "tool_calls": tool_calls
+                })
+                
+                for tool_call in tool_calls:
+                    yield {"event": "tool_start", "data": {
+                        "id": tool_call["id"],
+                        "name": tool_call["function"]["name"],
+                        "arguments": tool_call["function"]["arguments"]
+                    }}
+                
+                async def run(index: int, tool_call: Dict[str, Any]):
+                    function = tool_call["function"]
+                    return index, await self._run_tool_call(function["name"], function["arguments"], tool_semaphore, memo)
+                
+                results = [None] * len(tool_calls)
+                runs = [asyncio.create_task(run(i, call)) for i, call in enumerate(tool_calls)]
+                tasks.extend(runs)
+                for finished in asyncio.as_completed(runs):
+                    index, (result, arguments, reused) = await finished
+                    results[index] = (result, arguments, reused)
+                    error = result.get("error") if isinstance(result, dict) else None
+                    yield {"event": "tool_end", "data": {
+                        "id": tool_calls[index]["id"],
+                        "name": tool_calls[index]["function"]["name"],
+                        "error": error,
+                        "reused": reused
+                    }}
+                
+                for tool_call, (result, arguments, reused) in zip(tool_calls, results):
+                    # Every call is kept, in order, so one tool used for two symbols reports both.
+                    tool_results.setdefault(tool_call["function"]["name"], []).append(
+                        {"arguments": arguments, "result": result, "reused": reused}
+                    )
+                    usage["tool_calls"] += 1
+                    usage["reused_tool_calls"] += reused
                     
                     messages.append({
                         "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": json.dumps(result)
+                        "tool_call_id": tool_call["id"],
+                        "content": chat_budget.tool_content(tool_call["function"]["name"], result)
                     })
-                
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    tools=self.tools,
-                    tool_choice="auto"
-                )
-                assistant_message = response.choices[0].message
             
-            return {
-                "response": assistant_message.content,
+            yield {"event": "done", "data": {
+                "response": "".join(response_parts),
                 "symbol": symbol,
-                "data": tool_results if tool_results else None
-            }
+                "data": tool_results if tool_results else None,
+                "usage": usage
+            }}
             
         except Exception as e:
-            return {
+            yield {"event": "error", "data": {
                 "response": f"I apologize, but I encountered an error: {str(e)}. Please check if the OpenAI API key is configured correctly.",
                 "symbol": symbol,
                 "data": None
-            }
+            }}
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
-    async def generate_market_summary(self) -> Dict[str, Any]:
-        """Generate a comprehensive market summary."""
-        try:
-            indices = mcp_tools.get_market_indices()
-            movers = mcp_tools.get_top_movers("stocks", 5)
-            
-            summary_prompt = f"""Based on the following market data, provide a brief market summary:
+    async def chat(self, message: str, symbol: Optional[str] = None, 
+                   conversation_history: List[Dict] = None,
+                   session: Optional[ChatSession] = None) -> Dict[str, Any]:
+        """Process a chat message and return AI response with tool results."""
+        result = None
+        async for event in self.chat_stream(message, symbol, conversation_history, session):
+            if event["event"] in ("done", "error"):
+                result = event["data"]
+        return result
+
+    async def _gather_sources(self, **sources: Awaitable) -> Dict[str, Any]:
+        """Await independent data sources concurrently, each under its own timeout.
+
+        A source that fails or times out yields an ``{"error": ...}`` payload instead of
+        failing the others, so the analysis can proceed on partial data.
+        """
+        names = list(sources)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(source, timeout=self.source_timeout) for source in sources.values()),
+            return_exceptions=True
+        )
+        
+        data = {}
+        for name, result in zip(names, results):
+            if isinstance(result, asyncio.TimeoutError):
+                result = {"error": f"{name} timed out after {self.source_timeout:g}s"}
+            elif isinstance(result, Exception):
+                result = {"error": f"{name} unavailable: {str(result)}"}
+            data[name] = result
+        return data
+
+    async def gather_market_data(self) -> Dict[str, Any]:
+        """Fetch the market indices and top movers concurrently."""
+        return await self._gather_sources(
+            indices=async_tools.get_market_indices(),
+            movers=async_tools.get_top_movers("stocks", 5)
+        )
+
+    async def summarize_market_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask the model for a market summary of previously gathered market data."""
+        indices = data["indices"]
+        movers = data["movers"]
+        
+        summary_prompt = f"""Based on the following market data, provide a brief market summary:
 
 Market Indices: {json.dumps(indices)}
 Top Movers: {json.dumps(movers)}
@@ -278,36 +516,47 @@ Provide a concise summary of:
 3. Notable stock movements
 4. Any potential concerns or opportunities"""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": summary_prompt}
-                ]
-            )
-            
-            return {
-                "summary": response.choices[0].message.content,
-                "indices": indices,
-                "movers": movers
-            }
+        summary, cached = await self._cached_completion(
+            "market_summary", {"indices": indices, "movers": movers}, summary_prompt
+        )
+        
+        return {
+            "summary": summary,
+            "indices": indices,
+            "movers": movers,
+            "cached": cached
+        }
+
+    async def generate_market_summary(self) -> Dict[str, Any]:
+        """Generate a comprehensive market summary."""
+        try:
+            data = await self.gather_market_data()
+            if all(is_error_result(value) for value in data.values()):
+                return {"error": "Market data unavailable"}
+            return await self.summarize_market_data(data)
         except Exception as e:
             return {"error": str(e)}
 
-    async def generate_stock_recommendation(self, symbol: str) -> Dict[str, Any]:
-        """Generate a buy/sell/hold recommendation for a stock."""
-        try:
-            info = mcp_tools.get_stock_info(symbol)
-            technicals = mcp_tools.analyze_stock_technicals(symbol)
-            news = mcp_tools.get_stock_news(symbol)
-            recommendations = mcp_tools.get_recommendations(symbol)
-            
-            analysis_prompt = f"""Analyze the following stock data and provide a clear BUY, SELL, or HOLD recommendation:
+    async def gather_stock_data(self, symbol: str) -> Dict[str, Any]:
+        """Fetch info, technicals, news and analyst recommendations for a stock concurrently."""
+        data = await self._gather_sources(
+            info=async_tools.get_stock_info(symbol),
+            technicals=async_tools.analyze_stock_technicals(symbol),
+            news=async_tools.get_stock_news(symbol),
+            recommendations=async_tools.get_recommendations(symbol)
+        )
+        news = data["news"] if isinstance(data["news"], list) else [data["news"]]
+        data["news"] = news[:5]
+        return data
+
+    async def analyze_stock_data(self, symbol: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask the model for a buy/sell/hold recommendation on previously gathered stock data."""
+        analysis_prompt = f"""Analyze the following stock data and provide a clear BUY, SELL, or HOLD recommendation:
 
-Stock Info: {json.dumps(info)}
-Technical Analysis: {json.dumps(technicals)}
-Recent News: {json.dumps(news[:5])}
-Analyst Recommendations: {json.dumps(recommendations)}
+Stock Info: {json.dumps(data["info"])}
+Technical Analysis: {json.dumps(data["technicals"])}
+Recent News: {json.dumps(data["news"])}
+Analyst Recommendations: {json.dumps(data["recommendations"])}
 
 Provide:
 1. Clear recommendation (BUY/SELL/HOLD)
@@ -317,26 +566,25 @@ Provide:
 5. Detailed reasoning
 6. Key risks"""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": analysis_prompt}
-                ]
-            )
-            
-            return {
-                "symbol": symbol,
-                "analysis": response.choices[0].message.content,
-                "data": {
-                    "info": info,
-                    "technicals": technicals,
-                    "news": news[:5],
-                    "recommendations": recommendations
-                }
-            }
+        analysis, cached = await self._cached_completion(
+            "stock_analysis", {"symbol": symbol.upper(), **data}, analysis_prompt
+        )
+        
+        return {
+            "symbol": symbol,
+            "analysis": analysis,
+            "data": data,
+            "cached": cached
+        }
+
+    async def generate_stock_recommendation(self, symbol: str) -> Dict[str, Any]:
+        """Generate a buy/sell/hold recommendation for a stock."""
+        try:
+            data = await self.gather_stock_data(symbol)
+            if "error" in data["info"] and "error" in data["technicals"]:
+                return {"error": data["info"]["error"], "symbol": symbol}
+            return await self.analyze_stock_data(symbol, data)
         except Exception as e:
             return {"error": str(e), "symbol": symbol}
 
-
 ai_analyst = AIStockAnalyst()
@@ -0,0 +1,349 @@
+import os
+import asyncio
+import socket
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from .ai_service import ai_analyst
+from .database import get_user_by_id
+from .email_service import email_service
+from .job_queue import job_queue
+
+load_dotenv()
+
+
+class AlertRunProgress:
+    """Progress counters for one scheduled alert run."""
+
+    def __init__(self, run_id: str, trigger_time: str, total: int, shard: Tuple[int, int] = (1, 0),
+                 owners: Optional[List[str]] = None):
+        self.id = run_id
+        self.trigger_time = trigger_time
+        self.total = total
+        self.shard = shard
+        self.owners = owners or []
+        self.stolen_jobs: set = set()
+        self.distinct_symbols = 0
+        self.done = 0
+        self.failed = 0
+        self.retries = 0
+        self.errors: List[Dict[str, str]] = []
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return self.total - self.done - self.failed
+
+    def fail(self, scheduler_id: str, reason: str):
+        self.failed += 1
+        if len(self.errors) < 100:
+            self.errors.append({"scheduler_id": scheduler_id, "error": reason})
+
+    def finish(self):
+        self.finished_at = datetime.now()
+        self._finished = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self._finished if self._finished is not None else time.monotonic()
+        return {
+            "id": self.id,
+            "trigger_time": self.trigger_time,
+            "total": self.total,
+            "distinct_symbols": self.distinct_symbols,
+            "queued": self.queued,
+            "done": self.done,
+            "failed": self.failed,
+            "retries": self.retries,
+            "shard": {"count": self.shard[0], "index": self.shard[1]},
+            "stolen": len(self.stolen_jobs),
+            "errors": self.errors,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": round(end - self._started, 2)
+        }
+
+
+class AlertPlan:
+    """The distinct analyses a run needs, each computed once and shared by every subscriber."""
+
+    RETRY_FAILED_AFTER = 30.0
+
+    def __init__(self, schedulers: List[Dict]):
+        self.symbols = sorted({
+            symbol.strip().upper()
+            for scheduler in schedulers
+            for symbol in scheduler.get("symbols") or []
+        })
+        self.needs_market_summary = any(not scheduler.get("symbols") for scheduler in schedulers)
+        self._engine: Optional["AlertEngine"] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._failed_at: Dict[str, float] = {}
+
+    def _spawn(self, key: str) -> asyncio.Task:
+        if key == "__market__":
+            coro = self._engine._summarize_market()
+        else:
+            coro = self._engine._analyze_symbol(key)
+        task = asyncio.create_task(coro)
+        task.add_done_callback(lambda t: self._record_outcome(key, t))
+        self._tasks[key] = task
+        return task
+
+    def _record_outcome(self, key: str, task: asyncio.Task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None or (isinstance(task.result(), dict) and "error" in task.result()):
+            self._failed_at[key] = time.monotonic()
+
+    def start(self, engine: "AlertEngine"):
+        """Schedule every planned analysis; the engine's semaphores bound how many run at once."""
+        self._engine = engine
+        for symbol in self.symbols:
+            self._spawn(symbol)
+        if self.needs_market_summary:
+            self._spawn("__market__")
+
+    async def _shared(self, key: str) -> Dict[str, Any]:
+        task = self._tasks.get(key)
+        failed_at = self._failed_at.get(key)
+        # A failed analysis is recomputed (at most every RETRY_FAILED_AFTER seconds) so
+        # retried jobs are not stuck with the first failure.
+        if task is None or (task.done() and failed_at is not None
+                            and time.monotonic() - failed_at >= self.RETRY_FAILED_AFTER):
+            self._failed_at.pop(key, None)
+            task = self._spawn(key)
+        # Shielded so a subscriber hitting its deadline does not cancel work others share.
+        return await asyncio.shield(task)
+
+    async def analysis(self, symbol: str) -> Dict[str, Any]:
+        return await self._shared(symbol.strip().upper())
+
+    async def market_summary(self) -> Dict[str, Any]:
+        return await self._shared("__market__")
+
+    def cancel(self):
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+class AlertEngine:
+    """Worker pool that fans scheduled alerts out with separate limits for data, LLM and SMTP work."""
+
+    def __init__(self, workers: int, fetch_limit: int, llm_limit: int, smtp_limit: int,
+                 job_deadline: float, poll_interval: float = 5.0, worker_ttl: float = 45.0):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.workers = workers
+        self.worker_ttl = worker_ttl
+        self.job_deadline = job_deadline
+        self.poll_interval = poll_interval
+        self.fetch_semaphore = asyncio.Semaphore(fetch_limit)
+        self.llm_semaphore = asyncio.Semaphore(llm_limit)
+        self.smtp_semaphore = asyncio.Semaphore(smtp_limit)
+        self.runs: deque = deque(maxlen=20)
+        self._active_runs: Dict[str, asyncio.Task] = {}
+        self._last_purge = 0.0
+
+    async def _analyze_symbol(self, symbol: str) -> Dict[str, Any]:
+        async with self.fetch_semaphore:
+            data = await ai_analyst.gather_stock_data(symbol)
+        if "error" in data["info"] and "error" in data["technicals"]:
+            return {"error": data["info"]["error"], "symbol": symbol}
+        async with self.llm_semaphore:
+            return await ai_analyst.analyze_stock_data(symbol, data)
+
+    async def _summarize_market(self) -> Dict[str, Any]:
+        async with self.fetch_semaphore:
+            data = await ai_analyst.gather_market_data()
+        async with self.llm_semaphore:
+            return await ai_analyst.summarize_market_data(data)
+
+    async def build_alert_content(self, scheduler: Dict, plan: Optional[AlertPlan] = None) -> str:
+        """Produce the alert body for a scheduler: per-symbol analyses, or a market summary.
+
+        With a ``plan`` the analyses come from the run's shared results instead of being computed.
+        """
+        prompt = scheduler["prompt"]
+        symbols = scheduler.get("symbols", [])
+        analyze = plan.analysis if plan else self._analyze_symbol
+        summarize = plan.market_summary if plan else self._summarize_market
+
+        if symbols:
+            results = await asyncio.gather(
+                *(analyze(symbol) for symbol in symbols),
+                return_exceptions=True
+            )
+            analysis_parts = []
+            for symbol, result in zip(symbols, results):
+                if isinstance(result, dict) and "error" not in result:
+                    analysis_parts.append(f"**{symbol}**\n{result.get('analysis', 'No analysis available')}")
+            if not analysis_parts:
+                raise RuntimeError(f"No analysis available for {', '.join(symbols)}")
+
+            return f"Custom Prompt: {prompt}\n\n" + "\n\n---\n\n".join(analysis_parts)
+
+        market_summary = await summarize()
+        return f"Custom Prompt: {prompt}\n\n{market_summary.get('summary', 'No summary available')}"
+
+    async def send_alert(self, user: Dict, scheduler: Dict, alert_content: str) -> bool:
+        async with self.smtp_semaphore:
+            return await email_service.send_market_alert(
+                to_email=user["email"],
+                user_name=user["name"],
+                alert_content=alert_content,
+                trigger_time=scheduler["trigger_time"],
+                symbols=scheduler.get("symbols", [])
+            )
+
+    async def _deliver(self, scheduler: Dict, plan: AlertPlan):
+        user = get_user_by_id(scheduler["user_id"])
+        if not user:
+            raise LookupError("User not found")
+
+        alert_content = await self.build_alert_content(scheduler, plan)
+        if not await self.send_alert(user, scheduler, alert_content):
+            raise RuntimeError(f"Email to {user['email']} was not sent")
+
+        print(f"Alert sent to {user['email']} for scheduler {scheduler['id']}")
+
+    async def _worker(self, run_id: str, plan: AlertPlan, progress: AlertRunProgress):
+        lease = self.job_deadline + 60
+        count, index = progress.shard
+        while True:
+            job = await asyncio.to_thread(job_queue.claim, run_id, lease, progress.shard)
+            if job is None:
+                orphaned = await self._orphaned_shards(progress)
+                if orphaned:
+                    job = await asyncio.to_thread(job_queue.claim, run_id, lease, progress.shard, orphaned)
+            if job is None:
+                outstanding = await asyncio.to_thread(job_queue.outstanding, run_id)
+                if not outstanding["remaining"]:
+                    return
+                wait = (outstanding["next_ready_at"] or 0) - time.time()
+                await asyncio.sleep(min(max(wait, 0.5), self.poll_interval))
+                continue
+
+            scheduler = job["scheduler"]
+            if job["shard_key"] % count != index and job["id"] not in progress.stolen_jobs:
+                # Taken over from a worker that stopped heartbeating, or an expired lease.
+                progress.stolen_jobs.add(job["id"])
+                progress.total += 1
+            try:
+                await asyncio.wait_for(self._deliver(scheduler, plan), timeout=self.job_deadline)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    reason = f"Deadline of {self.job_deadline:g}s exceeded"
+                else:
+                    reason = str(e) or type(e).__name__
+                print(f"Error processing scheduler {scheduler['id']} "
+                      f"(attempt {job['attempts']}/{job['max_attempts']}): {reason}")
+                if await asyncio.to_thread(job_queue.fail, job, reason):
+                    progress.fail(scheduler["id"], reason)
+                else:
+                    progress.retries += 1
+            else:
+                await asyncio.to_thread(job_queue.complete, job["id"])
+                progress.done += 1
+
+    async def _shard(self) -> Tuple[Tuple[int, int], List[str]]:
+        """This process's ``(count, index)`` among the workers currently heartbeating, and those workers by shard."""
+        workers = await asyncio.to_thread(job_queue.live_workers, self.worker_ttl)
+        if self.worker_id not in workers:
+            return (1, 0), [self.worker_id]
+        return (len(workers), workers.index(self.worker_id)), workers
+
+    async def _orphaned_shards(self, progress: AlertRunProgress) -> List[int]:
+        """Shard indexes of the run whose owner has stopped heartbeating; a busy owner keeps its jobs."""
+        live = set(await asyncio.to_thread(job_queue.live_workers, self.worker_ttl))
+        return [index for index, owner in enumerate(progress.owners)
+                if owner not in live and index != progress.shard[1]]
+
+    async def heartbeat(self):
+        await asyncio.to_thread(job_queue.heartbeat, self.worker_id)
+
+    async def _drain(self, run_id: str, trigger_time: str) -> AlertRunProgress:
+        shard, owners = await self._shard()
+        schedulers = await asyncio.to_thread(job_queue.run_schedulers, run_id, shard)
+        plan = AlertPlan(schedulers)
+        progress = AlertRunProgress(run_id, trigger_time, len(schedulers), shard, owners)
+        progress.distinct_symbols = len(plan.symbols)
+        self.runs.append(progress)
+
+        plan.start(self)
+        try:
+            await asyncio.gather(
+                *(self._worker(run_id, plan, progress) for _ in range(max(1, min(self.workers, len(schedulers)))))
+            )
+        finally:
+            plan.cancel()
+        progress.finish()
+
+        summary = progress.to_dict()
+        print(f"Alert run {run_id} (shard {shard[1] + 1}/{shard[0]}) finished: {summary['done']} sent, "
+              f"{summary['failed']} dead-lettered, {summary['retries']} retries in {summary['duration_seconds']}s")
+        return progress
+
+    async def run(self, run_id: str, trigger_time: str, schedulers: Optional[List[Dict]] = None) -> AlertRunProgress:
+        """Enqueue a run's jobs (if given) and drain them from the durable queue.
+
+        Enqueueing is idempotent per ``run_id``, and draining an already active run just
+        waits for it, so a run can be safely re-triggered or resumed after a restart.
+        """
+        return await asyncio.shield(await self.submit(run_id, trigger_time, schedulers))
+
+    async def submit(self, run_id: str, trigger_time: str, schedulers: Optional[List[Dict]] = None) -> asyncio.Task:
+        """Enqueue a run's jobs (if given) and start draining them without waiting for the run."""
+        if schedulers:
+            await asyncio.to_thread(job_queue.enqueue_run, run_id, trigger_time, schedulers)
+        return self._ensure_draining(run_id, trigger_time)
+
+    def _ensure_draining(self, run_id: str, trigger_time: str) -> asyncio.Task:
+        task = self._active_runs.get(run_id)
+        if task is None:
+            task = asyncio.create_task(self._drain(run_id, trigger_time))
+            self._active_runs[run_id] = task
+            task.add_done_callback(lambda _: self._active_runs.pop(run_id, None))
+        return task
+
+    async def poll_runs(self):
+        """Heartbeat and start draining any unfinished run not already being drained here.
+
+        Every process calls this periodically, so runs enqueued by the leader (or left
+        behind by a crashed process) are picked up and split across all live workers.
+        Old finished jobs and expired worker rows are purged at most once an hour.
+        """
+        await self.heartbeat()
+        if time.time() - self._last_purge >= 3600:
+            self._last_purge = time.time()
+            purged = await asyncio.to_thread(job_queue.purge, self.worker_ttl)
+            if purged["jobs"] or purged["workers"]:
+                print(f"Purged {purged['jobs']} finished alert jobs and {purged['workers']} stale workers")
+        runs = await asyncio.to_thread(job_queue.unfinished_runs)
+        for run in runs:
+            if run["run_id"] not in self._active_runs:
+                print(f"Joining alert run {run['run_id']}")
+                self._ensure_draining(run["run_id"], run["trigger_time"])
+
+    async def leave(self):
+        """Stop heartbeating so the other workers take over this process's shard."""
+        await asyncio.to_thread(job_queue.remove_worker, self.worker_id)
+
+    def get_runs(self) -> List[Dict[str, Any]]:
+        """Return progress for recent runs, newest first."""
+        return [run.to_dict() for run in reversed(self.runs)]
+
+
+alert_engine = AlertEngine(
+    workers=int(os.getenv("ALERT_WORKERS", "32")),
+    fetch_limit=int(os.getenv("ALERT_FETCH_CONCURRENCY", "8")),
+    llm_limit=int(os.getenv("ALERT_LLM_CONCURRENCY", "4")),
+    smtp_limit=int(os.getenv("ALERT_SMTP_CONCURRENCY", "4")),
+    job_deadline=float(os.getenv("ALERT_JOB_DEADLINE", "300")),
+    worker_ttl=float(os.getenv("ALERT_WORKER_TTL", "45"))
+)
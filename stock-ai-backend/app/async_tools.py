@@ -0,0 +1,63 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from .mcp_tools import MCPStockTools, mcp_tools
+from .screener import screen
+
+load_dotenv()
+
+
+class AsyncStockTools:
+    """Async facade over MCPStockTools that runs blocking yfinance calls on a bounded thread pool."""
+
+    def __init__(self, tools: MCPStockTools, max_workers: int):
+        self.tools = tools
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="market-data")
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the market-data pool without stalling the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def get_stock_info(self, symbol: str) -> Dict[str, Any]:
+        return await self.run(self.tools.get_stock_info, symbol)
+
+    async def get_historical_data(self, symbol: str, period: str = "1mo", interval: str = "1d",
+                                  format: str = "records") -> Dict[str, Any]:
+        return await self.run(self.tools.get_historical_data, symbol, period, interval, format)
+
+    async def get_stock_news(self, symbol: str) -> List[Dict[str, Any]]:
+        return await self.run(self.tools.get_stock_news, symbol)
+
+    async def get_financials(self, symbol: str) -> Dict[str, Any]:
+        return await self.run(self.tools.get_financials, symbol)
+
+    async def get_recommendations(self, symbol: str) -> Dict[str, Any]:
+        return await self.run(self.tools.get_recommendations, symbol)
+
+    async def get_market_indices(self) -> List[Dict[str, Any]]:
+        return await self.run(self.tools.get_market_indices)
+
+    async def get_top_movers(self, market_type: str = "stocks", limit: int = 10) -> Dict[str, List[Dict]]:
+        return await self.run(self.tools.get_top_movers, market_type, limit)
+
+    async def analyze_stock_technicals(self, symbol: str) -> Dict[str, Any]:
+        return await self.run(self.tools.analyze_stock_technicals, symbol)
+
+    async def screen_stocks(self, symbols: Optional[List[str]] = None, filter_expression: Optional[str] = None,
+                            rank_by: str = "change_percent", descending: bool = True, limit: int = 50) -> Dict[str, Any]:
+        return await self.run(screen, symbols, filter_expression, rank_by, descending, limit)
+
+    async def search_stocks(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        return await self.run(self.tools.search_stocks, query, limit)
+
+    def shutdown(self):
+        """Stop accepting work and let in-flight fetches finish."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async_tools = AsyncStockTools(mcp_tools, max_workers=int(os.getenv("MARKET_DATA_MAX_WORKERS", "16")))
@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from dotenv import load_dotenv
+from .database import DATA_DIR
+
+load_dotenv()
+
+BAR_DTYPE = np.dtype([
+    ("ts", "i8"), ("open", "f8"), ("high", "f8"), ("low", "f8"), ("close", "f8"), ("volume", "f8")
+])
+COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3), "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+INTRADAY = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+INTERVALS = INTRADAY | {"1d", "5d", "1wk", "1mo", "3mo"}
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.^=-]{1,15}$")
+
+
+class BarStore:
+    """Local OHLCV store: one NumPy file per symbol and interval, extended at the tail.
+
+    Bars are kept as a structured array (UTC epoch seconds plus OHLCV) next to a small
+    JSON sidecar holding the exchange timezone, how far back the file is complete and
+    when it was last synced. Reads memory-map the file and slice it in place. A sync
+    re-fetches only the last two stored bars onward; the whole window is re-downloaded
+    when the file does not reach back far enough, or when a changed back-adjusted close
+    (after a dividend or split) means the stored history no longer matches upstream.
+    """
+
+    def __init__(self, root: str, max_age: float = 300):
+        self.root = root
+        self.max_age = max_age
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._metrics = {"disk_hits": 0, "tail_fetches": 0, "full_fetches": 0, "bars_fetched": 0}
+
+    # -- files -------------------------------------------------------------
+
+    def _paths(self, symbol: str, interval: str) -> Tuple[str, str]:
+        # Both parts become path components; history() has already checked them.
+        base = os.path.join(self.root, interval, symbol)
+        return base + ".npy", base + ".json"
+
+    def _load(self, symbol: str, interval: str) -> Tuple[Optional[np.ndarray], Dict[str, Any]]:
+        bars_path, meta_path = self._paths(symbol, interval)
+        if not (os.path.exists(bars_path) and os.path.exists(meta_path)):
+            return None, {}
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        try:
+            return np.load(bars_path, mmap_mode="r"), meta
+        except ValueError:  # an empty array cannot be memory-mapped
+            return np.load(bars_path), meta
+
+    def _save(self, symbol: str, interval: str, bars: np.ndarray, meta: Dict[str, Any]):
+        bars_path, meta_path = self._paths(symbol, interval)
+        os.makedirs(os.path.dirname(bars_path), exist_ok=True)
+        # Write-then-rename so concurrent readers keep a consistent (old) mapping.
+        with open(bars_path + ".tmp", "wb") as f:
+            np.save(f, bars)
+        os.replace(bars_path + ".tmp", bars_path)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    # -- conversion --------------------------------------------------------
+
+    @staticmethod
+    def _to_bars(hist: pd.DataFrame) -> np.ndarray:
+        hist = hist[hist["Close"].notna()]
+        bars = np.empty(len(hist), dtype=BAR_DTYPE)
+        bars["ts"] = hist.index.as_unit("s").asi8
+        for field, column in COLUMNS.items():
+            bars[field] = hist[column].to_numpy(dtype=float)
+        return bars
+
+    @staticmethod
+    def _to_frame(bars: np.ndarray, tz: Optional[str]) -> pd.DataFrame:
+        index = pd.to_datetime(bars["ts"], unit="s", utc=True)
+        if tz:
+            index = index.tz_convert(tz)
+        return pd.DataFrame({column: bars[field] for field, column in COLUMNS.items()}, index=index)
+
+    @staticmethod
+    def _period_start(period: str, now: pd.Timestamp) -> Optional[pd.Timestamp]:
+        """Calendar start of a yfinance period; None means all available history."""
+        if period == "max":
+            return None
+        if period == "ytd":
+            return now.normalize().replace(month=1, day=1)
+        if period in PERIOD_OFFSETS:
+            return now - PERIOD_OFFSETS[period]
+        if period.endswith("d") and period[:-1].isdigit():
+            # Trading-day periods: cover generously; the read keeps the last N sessions.
+            return now - pd.Timedelta(days=int(period[:-1]) * 2 + 4)
+        raise ValueError(f"Unsupported period: {period}")
+
+    # -- sync --------------------------------------------------------------
+
+    @staticmethod
+    def _covers(meta: Dict[str, Any], start: Optional[pd.Timestamp]) -> bool:
+        if not meta:
+            return False
+        if meta["covered_from"] is None:
+            return True
+        return start is not None and meta["covered_from"] <= start.timestamp()
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+    def _symbol_lock(self, symbol: str, interval: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
+
+    def _fetch_full(self, symbol: str, period: str, interval: str,
+                    start: Optional[pd.Timestamp]) -> Tuple[np.ndarray, Dict[str, Any]]:
+        hist = yf.Ticker(symbol).history(period=period, interval=interval)
+        self._count("full_fetches")
+        self._count("bars_fetched", len(hist))
+        bars = self._to_bars(hist) if not hist.empty else np.empty(0, dtype=BAR_DTYPE)
+        meta = {
+            "tz": str(hist.index.tz) if not hist.empty and hist.index.tz is not None else None,
+            "covered_from": start.timestamp() if start is not None else None,
+            "synced_at": time.time(),
+        }
+        return bars, meta
+
+    def _fetch_tail(self, symbol: str, interval: str, bars: np.ndarray,
+                    meta: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Stored bars extended with upstream's tail, or None if history must be re-read."""
+        overlap = bars[-2:] if len(bars) >= 2 else bars[-1:]
+        start = pd.Timestamp(int(overlap["ts"][0]), unit="s", tz="UTC")
+        if meta.get("tz"):
+            start = start.tz_convert(meta["tz"])
+        hist = yf.Ticker(symbol).history(start=start if interval in INTRADAY else start.date(), interval=interval)
+        self._count("tail_fetches")
+        self._count("bars_fetched", len(hist))
+        if hist.empty:
+            return bars
+
+        tail = self._to_bars(hist)
+        # The older overlapping bar is complete, so it must match what is stored (a
+        # dividend or split re-adjusts it upstream); the newest stored bar may still
+        # have been forming and is simply replaced.
+        complete = overlap[0]
+        match = tail[tail["ts"] == complete["ts"]]
+        if len(overlap) == 2 and (len(match) == 0 or not np.isclose(match["close"][0], complete["close"], rtol=1e-4)):
+            return None
+        return np.concatenate([bars[bars["ts"] < tail["ts"][0]], tail])
+
+    def history(self, symbol: str, period: str = "1mo", interval: str = "1d") -> pd.DataFrame:
+        """OHLCV bars like ``yf.Ticker(symbol).history(period, interval)``, served from disk.
+
+        Upstream is only contacted when the stored bars are older than ``max_age`` seconds
+        or do not reach back to the start of ``period``. Raises ValueError for a malformed
+        symbol or an interval yfinance does not offer; an empty fetch is returned but not stored.
+        """
+        symbol = symbol.strip().upper()
+        if not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol: {symbol}")
+        if interval not in INTERVALS:
+            raise ValueError(f"Unsupported interval: {interval}")
+        now = pd.Timestamp.now(tz="UTC")
+        start = self._period_start(period, now)
+
+        with self._symbol_lock(symbol, interval):
+            bars, meta = self._load(symbol, interval)
+            stale = bars is None or time.time() - meta["synced_at"] > self.max_age
+
+            if not self._covers(meta, start) or (stale and not len(bars)):
+                bars, meta = self._fetch_full(symbol, period, interval, start)
+                if len(bars):
+                    self._save(symbol, interval, bars, meta)
+            elif stale:
+                extended = self._fetch_tail(symbol, interval, bars, meta)
+                if extended is None:
+                    # Re-adjusted upstream: the stored prices are stale, start over.
+                    bars, meta = self._fetch_full(symbol, period, interval, start)
+                else:
+                    bars, meta = extended, {**meta, "synced_at": time.time()}
+                if len(bars):
+                    self._save(symbol, interval, bars, meta)
+            else:
+                self._count("disk_hits")
+
+        frame = self._to_frame(np.asarray(bars), meta.get("tz"))
+        if period.endswith("d") and period[:-1].isdigit():
+            sessions = frame.index.normalize().unique()[-int(period[:-1]):]
+            return frame[frame.index.normalize().isin(sessions)]
+        return frame if start is None else frame[frame.index >= start]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._metrics, "max_age_seconds": self.max_age}
+
+
+bar_store = BarStore(
+    os.getenv("BAR_STORE_DIR", os.path.join(DATA_DIR, "bars")),
+    max_age=float(os.getenv("BAR_STORE_MAX_AGE", "300"))
+)
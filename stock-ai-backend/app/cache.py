@@ -0,0 +1,151 @@
+import os
+import time
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from .singleflight import SingleFlight, market_flight
+
+load_dotenv()
+
+
+def is_error_result(value: Any) -> bool:
+    """Tool results report failures in-band; those must never be cached."""
+    if isinstance(value, dict):
+        return "error" in value
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return "error" in value[0]
+    return False
+
+
+def make_key(func: Callable, args: tuple, kwargs: dict) -> Tuple[Tuple, Optional[str]]:
+    """Build a canonical cache key from a call, applying defaults and normalizing symbols.
+
+    Returns the key and the (upper-cased) symbol the call refers to, if any.
+    """
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+    except TypeError:
+        arguments = {**{str(i): a for i, a in enumerate(args)}, **kwargs}
+
+    symbol = arguments.get("symbol")
+    if isinstance(symbol, str):
+        symbol = symbol.strip().upper()
+        arguments["symbol"] = symbol
+    else:
+        symbol = None
+
+    return (func.__qualname__, tuple(sorted(arguments.items()))), symbol
+
+
+class TTLCache:
+    """Thread-safe LRU cache with one TTL policy per data kind."""
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 2048):
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Tuple], Tuple[float, Any, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {kind: {"hits": 0, "misses": 0} for kind in self.ttls}
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, kind: str, key: Tuple) -> Tuple[bool, Any]:
+        """Return ``(hit, value)`` for a key, dropping it if it has expired."""
+        entry_key = (kind, key)
+        with self._lock:
+            counters = self._stats.setdefault(kind, {"hits": 0, "misses": 0})
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                expires_at, value, _ = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(entry_key)
+                    counters["hits"] += 1
+                    return True, value
+                del self._entries[entry_key]
+                self._expirations += 1
+            counters["misses"] += 1
+            return False, None
+
+    def set(self, kind: str, key: Tuple, value: Any, symbol: Optional[str] = None):
+        """Store a value under the TTL of its kind, evicting least recently used entries."""
+        ttl = self.ttls.get(kind, 0)
+        if ttl <= 0:
+            return
+        entry_key = (kind, key)
+        with self._lock:
+            self._entries[entry_key] = (time.monotonic() + ttl, value, symbol)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, kind: Optional[str] = None, symbol: Optional[str] = None) -> int:
+        """Drop entries matching the given kind and/or symbol (all entries if neither is given)."""
+        symbol = symbol.strip().upper() if symbol else None
+        with self._lock:
+            doomed = [
+                entry_key for entry_key, (_, _, entry_symbol) in self._entries.items()
+                if (kind is None or entry_key[0] == kind) and (symbol is None or entry_symbol == symbol)
+            ]
+            for entry_key in doomed:
+                del self._entries[entry_key]
+            return len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters per kind and overall occupancy."""
+        with self._lock:
+            kinds = {}
+            for kind, counters in self._stats.items():
+                total = counters["hits"] + counters["misses"]
+                kinds[kind] = {
+                    **counters,
+                    "ttl_seconds": self.ttls.get(kind, 0),
+                    "hit_rate": round(counters["hits"] / total, 4) if total else 0.0,
+                }
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "kinds": kinds,
+            }
+
+
+market_cache = TTLCache(
+    ttls={
+        "quote": float(os.getenv("QUOTE_CACHE_TTL", "15")),
+        "history": float(os.getenv("HISTORY_CACHE_TTL", "300")),
+        "news": float(os.getenv("NEWS_CACHE_TTL", "600")),
+        "financials": float(os.getenv("FINANCIALS_CACHE_TTL", "21600")),
+    },
+    max_entries=int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "2048")),
+)
+
+
+def cached(kind: str, cache: TTLCache = market_cache, flight: SingleFlight = market_flight):
+    """Serve a market-data function from ``cache`` using the TTL policy for ``kind``.
+
+    Misses are routed through ``flight`` so concurrent identical requests share one upstream fetch.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key, symbol = make_key(func, args, kwargs)
+            hit, value = cache.get(kind, key)
+            if hit:
+                return value
+
+            def load():
+                result = func(*args, **kwargs)
+                if not is_error_result(result):
+                    cache.set(kind, key, result, symbol)
+                return result
+
+            return flight.do(key, load)
+        return wrapper
+    return decorator
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from .token_budget import chat_budget
+from .tool_memo import ToolMemo
+
+load_dotenv()
+
+
+class ChatSession:
+    """Conversation state kept on the server: turns, a condensed summary and a tool result memo.
+
+    Turns are append-only so the prompt prefix stays identical between requests (which is
+    what lets the model provider reuse it). When the turns outgrow the history budget the
+    oldest are folded into the summary in one step, rather than sliding the window each turn.
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.turns: List[Dict[str, str]] = []
+        self.summary: List[str] = []
+        self.tools = ToolMemo()
+        self.lock = asyncio.Lock()
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self._content_size = 0
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes held: turn text plus memoized tool results."""
+        return self._content_size + self.tools.size
+
+    def history(self) -> List[Dict[str, str]]:
+        prefix = [chat_budget.summary_message(self.summary)] if self.summary else []
+        return prefix + self.turns
+
+    def add_turn(self, user_content: str, assistant_content: str):
+        self._append([{"role": "user", "content": user_content},
+                      {"role": "assistant", "content": assistant_content}])
+
+    def seed(self, history: List[Dict[str, str]]):
+        """Start a new session from history the client kept (the session lived on another worker)."""
+        self._append([{"role": turn["role"], "content": turn["content"]} for turn in history])
+
+    def _append(self, turns: List[Dict[str, str]]):
+        for turn in turns:
+            self.turns.append(turn)
+            self._content_size += len(turn["content"])
+
+        if chat_budget.tokens(self.turns) > chat_budget.history_tokens:
+            # Fold the oldest turns (whole exchanges) into the summary until half the budget is free.
+            folded = 0
+            while folded < len(self.turns) - 2 and chat_budget.tokens(self.turns[folded:]) > chat_budget.history_tokens // 2:
+                folded += 2
+            moved, self.turns = self.turns[:folded], self.turns[folded:]
+            self.summary = self._merge_summary(moved)
+            self._content_size -= sum(len(turn["content"]) for turn in moved)
+        self.tools.purge()
+
+    def _merge_summary(self, moved: List[Dict[str, str]]) -> List[str]:
+        """Append condensed lines for ``moved`` turns, dropping the oldest lines past a quarter of the budget."""
+        lines = self.summary + chat_budget.condense(moved, chat_budget.history_tokens // 4)
+        while len(lines) > 1 and chat_budget.tokens([chat_budget.summary_message(lines)]) > chat_budget.history_tokens // 4:
+            lines.pop(0)
+        return lines
+
+
+class ChatSessionStore:
+    """In-memory chat sessions with idle expiry and LRU eviction under a count and size bound.
+
+    Sessions are local to the worker process; a request naming an unknown or evicted
+    session (e.g. one that landed on another worker) starts a new one, seeded from the
+    history the client sends along, and the client picks up the new id from the response.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 idle_ttl: float = 3600):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._metrics = {"created": 0, "resumed": 0, "expired": 0, "evicted": 0}
+
+    def open(self, session_id: Optional[str] = None,
+             history: Optional[List[Dict[str, str]]] = None) -> ChatSession:
+        """The live session for ``session_id``, or a new session seeded with ``history``."""
+        self._expire()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = ChatSession(uuid.uuid4().hex)
+            if history:
+                session.seed(history)
+            self._sessions[session.id] = session
+            self._metrics["created"] += 1
+        else:
+            self._metrics["resumed"] += 1
+        session.last_used = time.time()
+        self._sessions.move_to_end(session.id)
+        self.enforce_bounds()
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        return self._sessions.get(session_id)
+
+    def close(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        cutoff = time.time() - self.idle_ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used > cutoff:
+                break
+            del self._sessions[session.id]
+            self._metrics["expired"] += 1
+
+    def enforce_bounds(self):
+        """Evict least recently used idle sessions until the count and size bounds hold."""
+        total = sum(session.size for session in self._sessions.values())
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions and total <= self.max_bytes:
+                break
+            session = self._sessions[session_id]
+            if session.lock.locked():
+                continue
+            total -= session.size
+            del self._sessions[session_id]
+            self._metrics["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "bytes": sum(session.size for session in self._sessions.values()),
+            "max_bytes": self.max_bytes,
+            "idle_ttl_seconds": self.idle_ttl
+        }
+
+
+chat_sessions = ChatSessionStore(
+    max_sessions=int(os.getenv("CHAT_SESSION_MAX", "1000")),
+    max_bytes=int(os.getenv("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+    idle_ttl=float(os.getenv("CHAT_SESSION_IDLE_TTL", "3600"))
+)
@@ -1,152 +1,409 @@
 import json
 import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Tuple
 import hashlib
 import uuid
+from dotenv import load_dotenv
+from .schedule import next_run_timestamp, schedule_changed
+
+load_dotenv()
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "sqlite")
+DATABASE_FILE = os.getenv("DATABASE_PATH", os.path.join(DATA_DIR, "stock_ai.db"))
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "8"))
+
+# JSON stores: imported into SQLite the first time the database is opened, or used
+# directly as the snapshot files of the "file" backend.
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 SCHEDULERS_FILE = os.path.join(DATA_DIR, "schedulers.json")
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS schedulers (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    trigger_time TEXT NOT NULL,
+    symbols TEXT NOT NULL DEFAULT '[]',
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}',
+    next_run_at REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_schedulers_trigger_active ON schedulers (trigger_time, is_active);
+CREATE INDEX IF NOT EXISTS idx_schedulers_user_id ON schedulers (user_id);
+"""
+
+SCHEDULER_COLUMNS = ("id", "user_id", "prompt", "trigger_time", "symbols", "is_active", "created_at")
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared across threads."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
 
 def ensure_data_dir():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, "w") as f:
-            json.dump({}, f)
-    if not os.path.exists(SCHEDULERS_FILE):
-        with open(SCHEDULERS_FILE, "w") as f:
-            json.dump({}, f)
+    os.makedirs(os.path.dirname(os.path.abspath(DATABASE_FILE)), exist_ok=True)
 
 
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-def load_users() -> Dict:
-    ensure_data_dir()
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
+def _get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                ensure_data_dir()
+                pool = ConnectionPool(DATABASE_FILE, DATABASE_POOL_SIZE)
+                with pool.connection() as conn:
+                    conn.executescript(SCHEMA)
+                    migrate_next_run_column(conn)
+                    migrate_json_files(conn)
+                _pool = pool
+    return _pool
+
+
+@contextmanager
+def _transaction() -> Iterator[sqlite3.Connection]:
+    """Run statements in a write transaction that takes the database lock up front."""
+    with _get_pool().connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+@contextmanager
+def _reader() -> Iterator[sqlite3.Connection]:
+    with _get_pool().connection() as conn:
+        yield conn
+
+
+def _read_json_file(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+
+def migrate_next_run_column(conn: sqlite3.Connection):
+    """Add the dispatch index to databases created before per-scheduler trigger times."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(schedulers)")}
+    if "next_run_at" not in columns:
+        conn.execute("ALTER TABLE schedulers ADD COLUMN next_run_at REAL")
+        rows = conn.execute("SELECT * FROM schedulers").fetchall()
+        conn.execute("BEGIN IMMEDIATE")
+        for row in rows:
+            conn.execute(
+                "UPDATE schedulers SET next_run_at = ? WHERE id = ?",
+                (next_run_timestamp(_scheduler_from_row(row)), row["id"])
+            )
+        conn.execute("COMMIT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_schedulers_next_run ON schedulers (is_active, next_run_at)")
+
+
+def migrate_json_files(conn: sqlite3.Connection):
+    """Import the legacy users.json and schedulers.json stores once."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return
+
+    users = _read_json_file(USERS_FILE)
+    schedulers = _read_json_file(SCHEDULERS_FILE)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for email, user in users.items():
+            conn.execute(
+                "INSERT OR IGNORE INTO users (id, email, name, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user["id"], user.get("email", email), user["name"], user["password_hash"], user["created_at"])
+            )
+        for scheduler in schedulers.values():
+            _write_scheduler(conn, scheduler, replace=False)
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)",
+            (datetime.now().isoformat(),)
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    if users or schedulers:
+        print(f"Imported {len(users)} users and {len(schedulers)} schedulers from JSON into {DATABASE_FILE}")
+
+
+def _public_user(row: sqlite3.Row) -> Dict:
+    return {
+        "id": row["id"],
+        "email": row["email"],
+        "name": row["name"],
+        "created_at": row["created_at"]
+    }
+
 
+def _scheduler_from_row(row: sqlite3.Row) -> Dict:
+    scheduler = {
+        "id": row["id"],
+        "user_id": row["user_id"],
+        "prompt": row["prompt"],
+        "trigger_time": row["trigger_time"],
+        "symbols": json.loads(row["symbols"]),
+        "is_active": bool(row["is_active"]),
+        "created_at": row["created_at"]
+    }
+    scheduler.update(json.loads(row["extra"]))
+    return scheduler
+
+
+def _write_scheduler(conn: sqlite3.Connection, scheduler: Dict, replace: bool = True,
+                     next_run_at: Optional[float] = None):
+    """Insert or replace a scheduler row; ``next_run_at`` defaults to its next fire time from now."""
+    extra = {k: v for k, v in scheduler.items() if k not in SCHEDULER_COLUMNS}
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    conn.execute(
+        f"""{verb} INTO schedulers (id, user_id, prompt, trigger_time, symbols, is_active, created_at, extra, next_run_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            scheduler["id"],
+            scheduler["user_id"],
+            scheduler["prompt"],
+            scheduler["trigger_time"],
+            json.dumps(scheduler.get("symbols") or []),
+            int(bool(scheduler.get("is_active", True))),
+            scheduler["created_at"],
+            json.dumps(extra, default=str),
+            next_run_at if next_run_at is not None else next_run_timestamp(scheduler)
+        )
+    )
 
-def save_users(users: Dict):
-    ensure_data_dir()
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2, default=str)
+
+def load_users() -> Dict:
+    with _reader() as conn:
+        rows = conn.execute("SELECT * FROM users").fetchall()
+    return {row["email"]: dict(row) for row in rows}
 
 
 def create_user(email: str, name: str, password: str) -> Optional[Dict]:
-    users = load_users()
-    if email in users:
-        return None
-    
     user_id = str(uuid.uuid4())
-    users[email] = {
-        "id": user_id,
-        "email": email,
-        "name": name,
-        "password_hash": hash_password(password),
-        "created_at": datetime.now().isoformat()
-    }
-    save_users(users)
+    created_at = datetime.now().isoformat()
+    try:
+        with _transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (id, email, name, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, email, name, hash_password(password), created_at)
+            )
+    except sqlite3.IntegrityError:
+        return None
     return {
         "id": user_id,
         "email": email,
         "name": name,
-        "created_at": users[email]["created_at"]
+        "created_at": created_at
     }
 
 
 def authenticate_user(email: str, password: str) -> Optional[Dict]:
-    users = load_users()
-    if email not in users:
+    with _reader() as conn:
+        user = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+    if user is None:
         return None
-    
-    user = users[email]
+
     if user["password_hash"] != hash_password(password):
         return None
-    
-    return {
-        "id": user["id"],
-        "email": user["email"],
-        "name": user["name"],
-        "created_at": user["created_at"]
-    }
+
+    return _public_user(user)
 
 
 def get_user_by_id(user_id: str) -> Optional[Dict]:
-    users = load_users()
-    for email, user in users.items():
-        if user["id"] == user_id:
-            return {
-                "id": user["id"],
-                "email": user["email"],
-                "name": user["name"],
-                "created_at": user["created_at"]
-            }
-    return None
+    with _reader() as conn:
+        user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    return _public_user(user) if user else None
 
 
 def load_schedulers() -> Dict:
-    ensure_data_dir()
-    with open(SCHEDULERS_FILE, "r") as f:
-        return json.load(f)
-
+    with _reader() as conn:
+        rows = conn.execute("SELECT * FROM schedulers").fetchall()
+    return {row["id"]: _scheduler_from_row(row) for row in rows}
 
-def save_schedulers(schedulers: Dict):
-    ensure_data_dir()
-    with open(SCHEDULERS_FILE, "w") as f:
-        json.dump(schedulers, f, indent=2, default=str)
 
-
-def create_scheduler(user_id: str, prompt: str, trigger_time: str, symbols: List[str], is_active: bool = True) -> Dict:
-    schedulers = load_schedulers()
-    scheduler_id = str(uuid.uuid4())
-    
-    schedulers[scheduler_id] = {
-        "id": scheduler_id,
+def create_scheduler(user_id: str, prompt: str, trigger_time: str, symbols: List[str], is_active: bool = True,
+                     cron: Optional[str] = None, timezone: Optional[str] = None) -> Dict:
+    scheduler = {
+        "id": str(uuid.uuid4()),
         "user_id": user_id,
         "prompt": prompt,
         "trigger_time": trigger_time,
+        "cron": cron,
+        "timezone": timezone,
         "symbols": symbols,
         "is_active": is_active,
         "created_at": datetime.now().isoformat()
     }
-    save_schedulers(schedulers)
-    return schedulers[scheduler_id]
+    with _transaction() as conn:
+        _write_scheduler(conn, scheduler, replace=False)
+    return scheduler
 
 
 def get_user_schedulers(user_id: str) -> List[Dict]:
-    schedulers = load_schedulers()
-    return [s for s in schedulers.values() if s["user_id"] == user_id]
+    with _reader() as conn:
+        rows = conn.execute(
+            "SELECT * FROM schedulers WHERE user_id = ? ORDER BY created_at", (user_id,)
+        ).fetchall()
+    return [_scheduler_from_row(row) for row in rows]
 
 
 def get_scheduler_by_id(scheduler_id: str) -> Optional[Dict]:
-    schedulers = load_schedulers()
-    return schedulers.get(scheduler_id)
+    with _reader() as conn:
+        row = conn.execute("SELECT * FROM schedulers WHERE id = ?", (scheduler_id,)).fetchone()
+    return _scheduler_from_row(row) if row else None
 
 
 def update_scheduler(scheduler_id: str, updates: Dict) -> Optional[Dict]:
-    schedulers = load_schedulers()
-    if scheduler_id not in schedulers:
-        return None
-    
-    schedulers[scheduler_id].update(updates)
-    save_schedulers(schedulers)
-    return schedulers[scheduler_id]
+    with _transaction() as conn:
+        row = conn.execute("SELECT * FROM schedulers WHERE id = ?", (scheduler_id,)).fetchone()
+        if row is None:
+            return None
+
+        before = _scheduler_from_row(row)
+        scheduler = {**before, **updates, "id": scheduler_id}
+        # An edit that leaves the schedule alone must not skip a fire that is due but not yet dispatched.
+        next_run_at = None if schedule_changed(before, scheduler) else row["next_run_at"]
+        _write_scheduler(conn, scheduler, next_run_at=next_run_at)
+    return scheduler
 
 
 def delete_scheduler(scheduler_id: str) -> bool:
-    schedulers = load_schedulers()
-    if scheduler_id not in schedulers:
-        return False
-    
-    del schedulers[scheduler_id]
-    save_schedulers(schedulers)
-    return True
-
-
-def get_active_schedulers_by_trigger(trigger_time: str) -> List[Dict]:
-    schedulers = load_schedulers()
-    return [s for s in schedulers.values() if s["trigger_time"] == trigger_time and s["is_active"]]
+    with _transaction() as conn:
+        cursor = conn.execute("DELETE FROM schedulers WHERE id = ?", (scheduler_id,))
+    return cursor.rowcount > 0
+
+
+def find_due_schedulers(now: float) -> List[Tuple[Dict, float]]:
+    """Active schedulers whose next fire time is at or before ``now``, with that time.
+
+    Uses the ``(is_active, next_run_at)`` index, so only due rows are read. Nothing is
+    changed: the caller enqueues the runs first and then calls ``advance_schedulers``.
+    """
+    with _reader() as conn:
+        rows = conn.execute(
+            "SELECT * FROM schedulers WHERE is_active = 1 AND next_run_at <= ? ORDER BY next_run_at",
+            (now,)
+        ).fetchall()
+    return [(_scheduler_from_row(row), row["next_run_at"]) for row in rows]
+
+
+def advance_schedulers(due: List[Tuple[Dict, float]], now: float):
+    """Move each ``(scheduler, due_at)`` from ``find_due_schedulers`` to its next fire time after ``now``.
+
+    A scheduler edited or deleted since it was found keeps the schedule it has now.
+    """
+    with _transaction() as conn:
+        for scheduler, due_at in due:
+            conn.execute(
+                "UPDATE schedulers SET next_run_at = ? WHERE id = ? AND next_run_at = ?",
+                (next_run_timestamp(scheduler, now), scheduler["id"], due_at)
+            )
+
+
+def close_database():
+    """Release pooled connections on shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+if DATABASE_BACKEND == "file":
+    from .file_store import FileStore
+
+    _file_store = FileStore(
+        DATA_DIR,
+        flush_interval=float(os.getenv("FILE_STORE_FLUSH_INTERVAL", "0.5")),
+        compact_every=int(os.getenv("FILE_STORE_COMPACT_EVERY", "1000"))
+    )
+
+    def create_user(email: str, name: str, password: str) -> Optional[Dict]:
+        return _file_store.create_user(email, name, hash_password(password))
+
+    def authenticate_user(email: str, password: str) -> Optional[Dict]:
+        return _file_store.authenticate_user(email, hash_password(password))
+
+    load_users = _file_store.load_users
+    get_user_by_id = _file_store.get_user_by_id
+    load_schedulers = _file_store.load_schedulers
+    create_scheduler = _file_store.create_scheduler
+    get_user_schedulers = _file_store.get_user_schedulers
+    get_scheduler_by_id = _file_store.get_scheduler_by_id
+    update_scheduler = _file_store.update_scheduler
+    find_due_schedulers = _file_store.find_due_schedulers
+    advance_schedulers = _file_store.advance_schedulers
+    delete_scheduler = _file_store.delete_scheduler
+    close_database = _file_store.close
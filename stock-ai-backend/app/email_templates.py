@@ -0,0 +1,256 @@
+import html
+import re
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from functools import lru_cache
+from string import Template
+from typing import List, Optional, Tuple
+
+# Shells are parsed once at import. Fields shared by every recipient of an alert are
+# filled in (and memoized) first, leaving only $user_name to substitute per message.
+
+ALERT_TEXT = Template("""Hello $user_name,
+
+Here is your $time_label stock market update:
+
+Symbols: $symbols
+
+$alert_content
+
+---
+This is an automated alert from Stock AI Analyst.
+To manage your alerts, visit the Scheduler page in the application.
+""")
+
+ALERT_HTML = Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 20px; border-radius: 0 0 10px 10px; }
+        .symbols { background: #e8e8e8; padding: 10px; border-radius: 5px; margin: 10px 0; }
+        .footer { margin-top: 20px; font-size: 12px; color: #666; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>Stock AI Alert - $time_label</h2>
+        </div>
+        <div class="content">
+            <p>Hello $user_name,</p>
+            <p>Here is your $time_label stock market update:</p>
+            <div class="symbols">
+                <strong>Symbols:</strong> $symbols
+            </div>
+            <div>$alert_content</div>
+        </div>
+        <div class="footer">
+            <p>This is an automated alert from Stock AI Analyst.</p>
+            <p>To manage your alerts, visit the Scheduler page in the application.</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+WELCOME_TEXT = Template("""Hello $user_name,
+
+Welcome to Stock AI Analyst!
+
+Your account has been successfully created. You can now:
+
+1. View the Market Dashboard for real-time market summaries
+2. Chat with our AI Analyst for personalized stock insights
+3. Explore stocks, ETFs, and funds in the Market Explorer
+4. Set up automated alerts in the Scheduler
+
+Get started by logging into your account and exploring the features.
+
+Best regards,
+Stock AI Analyst Team
+""")
+
+WELCOME_HTML = Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px 10px 0 0; text-align: center; }
+        .content { background: #f9f9f9; padding: 20px; border-radius: 0 0 10px 10px; }
+        .feature { background: white; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #667eea; }
+        .footer { margin-top: 20px; font-size: 12px; color: #666; text-align: center; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Welcome to Stock AI Analyst</h1>
+        </div>
+        <div class="content">
+            <p>Hello $user_name,</p>
+            <p>Your account has been successfully created. You can now:</p>
+            <div class="feature">
+                <strong>Market Dashboard</strong><br>
+                View real-time market summaries and indices
+            </div>
+            <div class="feature">
+                <strong>AI Analyst Chat</strong><br>
+                Get personalized stock insights and recommendations
+            </div>
+            <div class="feature">
+                <strong>Market Explorer</strong><br>
+                Explore stocks, ETFs, and funds with detailed analysis
+            </div>
+            <div class="feature">
+                <strong>Scheduler</strong><br>
+                Set up automated morning and evening alerts
+            </div>
+        </div>
+        <div class="footer">
+            <p>Best regards,<br>Stock AI Analyst Team</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+TIME_LABELS = {"morning": "Morning Pre-Market", "evening": "Evening Post-Market"}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_LIST_ITEM = re.compile(r"^(?:[-*+]|(\d+)\.)\s+(.*)$")
+_RULE = re.compile(r"^(?:-{3,}|\*{3,}|_{3,})$")
+_SECTION_BREAK = re.compile(r"\n\s*---\s*\n")
+_CODE = re.compile(r"`([^`]+)`")
+_BOLD = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC = re.compile(r"(?<![\*\w])\*(?!\s)(.+?)(?<!\s)\*(?![\*\w])")
+
+
+def _inline(text: str) -> str:
+    text = html.escape(text, quote=False)
+    text = _CODE.sub(r"<code>\1</code>", text)
+    text = _BOLD.sub(r"<strong>\1</strong>", text)
+    return _ITALIC.sub(r"<em>\1</em>", text)
+
+
+@lru_cache(maxsize=1024)
+def _render_section(section: str) -> str:
+    out: List[str] = []
+    paragraph: List[str] = []
+    list_tag: Optional[str] = None
+
+    def flush_paragraph():
+        if paragraph:
+            out.append("<p>" + "<br>\n".join(paragraph) + "</p>")
+            paragraph.clear()
+
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            out.append(f"</{list_tag}>")
+            list_tag = None
+
+    for line in section.splitlines():
+        stripped = line.strip()
+        heading = _HEADING.match(stripped)
+        item = _LIST_ITEM.match(stripped)
+
+        if not stripped:
+            flush_paragraph()
+            close_list()
+        elif heading:
+            flush_paragraph()
+            close_list()
+            level = min(len(heading.group(1)) + 2, 6)
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif _RULE.match(stripped):
+            flush_paragraph()
+            close_list()
+            out.append("<hr>")
+        elif item:
+            flush_paragraph()
+            tag = "ol" if item.group(1) else "ul"
+            if list_tag != tag:
+                close_list()
+                out.append(f"<{tag}>")
+                list_tag = tag
+            out.append(f"<li>{_inline(item.group(2))}</li>")
+        else:
+            close_list()
+            paragraph.append(_inline(stripped))
+
+    flush_paragraph()
+    close_list()
+    return "\n".join(out)
+
+
+def render_markdown(text: str) -> str:
+    """Convert the model's markdown to HTML.
+
+    Sections separated by ``---`` (one per symbol in an alert) are rendered and cached
+    individually, so an analysis shared by many alerts is converted only once.
+    """
+    return "\n<hr>\n".join(_render_section(section) for section in _SECTION_BREAK.split(text))
+
+
+def _escape_dollars(value: str) -> str:
+    return value.replace("$", "$$")
+
+
+@lru_cache(maxsize=256)
+def _alert_shells(alert_content: str, trigger_time: str, symbols: Tuple[str, ...]) -> Tuple[str, Template, Template]:
+    """Fill the recipient-independent parts of an alert, leaving only $user_name."""
+    time_label = TIME_LABELS.get(trigger_time, "Scheduled")
+    symbols_str = ", ".join(symbols) if symbols else "General Market"
+
+    subject = f"Stock AI Alert - {time_label} Update"
+    text = ALERT_TEXT.safe_substitute(
+        time_label=time_label,
+        symbols=_escape_dollars(symbols_str),
+        alert_content=_escape_dollars(alert_content)
+    )
+    html_body = ALERT_HTML.safe_substitute(
+        time_label=time_label,
+        symbols=_escape_dollars(html.escape(symbols_str)),
+        alert_content=_escape_dollars(render_markdown(alert_content))
+    )
+    return subject, Template(text), Template(html_body)
+
+
+def render_market_alert(user_name: str, alert_content: str, trigger_time: str,
+                        symbols: Optional[List[str]] = None) -> Tuple[str, str, str]:
+    """Return ``(subject, text, html)`` for a market alert."""
+    subject, text, html_body = _alert_shells(alert_content, trigger_time, tuple(symbols or ()))
+    return (
+        subject,
+        text.substitute(user_name=user_name),
+        html_body.substitute(user_name=html.escape(user_name))
+    )
+
+
+def render_welcome(user_name: str) -> Tuple[str, str, str]:
+    """Return ``(subject, text, html)`` for the welcome email."""
+    return (
+        "Welcome to Stock AI Analyst",
+        WELCOME_TEXT.substitute(user_name=user_name),
+        WELCOME_HTML.substitute(user_name=html.escape(user_name))
+    )
+
+
+def build_message(from_email: str, to_email: str, subject: str, body: str,
+                  html_body: Optional[str] = None) -> MIMEMultipart:
+    message = MIMEMultipart("alternative")
+    message["From"] = from_email
+    message["To"] = to_email
+    message["Subject"] = subject
+
+    message.attach(MIMEText(body, "plain"))
+    if html_body:
+        message.attach(MIMEText(html_body, "html"))
+    return message
+
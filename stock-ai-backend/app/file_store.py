@@ -0,0 +1,343 @@
+import copy
+import fcntl
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, List, Dict, Set, Tuple
+from .schedule import next_run_timestamp, schedule_changed
+
+
+class FileStore:
+    """In-memory, indexed user/scheduler repository with write-behind file persistence.
+
+    Every mutation is applied to the in-memory indexes under a lock and queued as a
+    journal record. A background thread appends queued records to ``journal.log``
+    and periodically compacts the journal into ``users.json``/``schedulers.json``
+    (plus ``schedule.json`` with each scheduler's next fire time) via write-then-rename,
+    so a crash can never leave a truncated snapshot.
+
+    All state lives in this process, so the store is single-process only: it holds an
+    exclusive lock on ``data_dir`` and a second instance fails at startup. Run one
+    worker with this backend, or use the SQLite backend for several.
+    """
+
+    def __init__(self, data_dir: str, flush_interval: float = 0.5,
+                 compact_every: int = 1000, compact_interval: float = 300.0):
+        self.data_dir = data_dir
+        self.users_file = os.path.join(data_dir, "users.json")
+        self.schedulers_file = os.path.join(data_dir, "schedulers.json")
+        self.schedule_file = os.path.join(data_dir, "schedule.json")
+        self.journal_file = os.path.join(data_dir, "journal.log")
+        self.lock_file = os.path.join(data_dir, "file_store.lock")
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+
+        self._lock = threading.RLock()
+        self._users_by_email: Dict[str, Dict] = {}
+        self._users_by_id: Dict[str, Dict] = {}
+        self._schedulers: Dict[str, Dict] = {}
+        self._schedulers_by_user: Dict[str, Set[str]] = {}
+        # Min-heap of (next_run_at, scheduler_id) for dispatch. Entries are invalidated
+        # lazily: one only counts if it still matches _next_run for that scheduler.
+        self._due_heap: List[Tuple[float, str]] = []
+        self._next_run: Dict[str, float] = {}
+
+        self._pending: List[Dict] = []
+        self._journal_records = 0
+        self._last_compaction = time.monotonic()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._flusher: Optional[threading.Thread] = None
+
+        self._lock_fd = self._acquire_dir_lock()
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+
+    def _acquire_dir_lock(self) -> int:
+        os.makedirs(self.data_dir, exist_ok=True)
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise RuntimeError(
+                f"{self.data_dir} is already in use by another process. The file backend is "
+                "single-process; run one worker or set DATABASE_BACKEND=sqlite."
+            )
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        return fd
+
+    def _load(self):
+        for user in self._read_json(self.users_file).values():
+            self._index_user(user)
+        for scheduler in self._read_json(self.schedulers_file).values():
+            self._index_scheduler(scheduler)
+        for scheduler_id, next_run_at in self._read_json(self.schedule_file).items():
+            if scheduler_id in self._schedulers:
+                self._schedule(scheduler_id, next_run_at)
+
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "rb+") as f:
+                intact = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn final write from a crash; everything before it is intact
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(record)
+                    self._journal_records += 1
+                    intact += len(line)
+                # Cut the torn tail so new records are not appended onto the fragment.
+                if f.seek(0, os.SEEK_END) > intact:
+                    print(f"Truncating torn journal tail at byte {intact} of {self.journal_file}")
+                    f.truncate(intact)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    @staticmethod
+    def _read_json(path: str) -> Dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _ensure_flusher(self):
+        if self._flusher is None and not self._stopping:
+            self._flusher = threading.Thread(target=self._flush_loop, name="file-store-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush()
+        self._flush()
+        self._compact()
+
+    def _flush(self):
+        """Append queued records to the journal and compact when it has grown enough."""
+        with self._lock:
+            records, self._pending = self._pending, []
+        if records:
+            with open(self.journal_file, "a") as f:
+                f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_records += len(records)
+
+        if self._journal_records >= self.compact_every or (
+            self._journal_records and time.monotonic() - self._last_compaction >= self.compact_interval
+        ):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the snapshots from memory and reset the journal.
+
+        Only the flusher thread (or ``close`` once it has stopped) touches the files,
+        so nothing can be appended to the journal between snapshot and truncation.
+        """
+        with self._lock:
+            users = json.dumps(self._users_by_email, indent=2, default=str)
+            schedulers = json.dumps(self._schedulers, indent=2, default=str)
+            schedule = json.dumps(self._next_run)
+            # Drop the superseded entries left behind by edits and advances.
+            self._due_heap = [(next_run_at, scheduler_id) for scheduler_id, next_run_at in self._next_run.items()]
+            heapq.heapify(self._due_heap)
+            self._pending = []
+        self._write_atomic(self.users_file, users)
+        self._write_atomic(self.schedulers_file, schedulers)
+        self._write_atomic(self.schedule_file, schedule)
+        self._write_atomic(self.journal_file, "")
+        self._journal_records = 0
+        self._last_compaction = time.monotonic()
+
+    def _record(self, record: Dict):
+        self._apply(record)
+        self._pending.append(record)
+        self._ensure_flusher()
+
+    def close(self):
+        """Stop the flusher after writing everything still queued."""
+        self._stopping = True
+        if self._flusher is not None:
+            self._wake.set()
+            self._flusher.join()
+        else:
+            self._flush()
+            self._compact()
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    # -- indexes -----------------------------------------------------------
+
+    def _apply(self, record: Dict):
+        op = record["op"]
+        if op == "put_user":
+            self._index_user(record["user"])
+        elif op == "put_scheduler":
+            self._index_scheduler(record["scheduler"])
+            if "next_run_at" in record:
+                self._schedule(record["scheduler"]["id"], record["next_run_at"])
+        elif op == "schedule":
+            if record["id"] in self._schedulers:
+                self._schedule(record["id"], record["next_run_at"])
+        elif op == "delete_scheduler":
+            self._unindex_scheduler(record["id"])
+
+    def _index_user(self, user: Dict):
+        self._users_by_email[user["email"]] = user
+        self._users_by_id[user["id"]] = user
+
+    def _index_scheduler(self, scheduler: Dict):
+        self._unindex_scheduler(scheduler["id"])
+        self._schedulers[scheduler["id"]] = scheduler
+        self._schedulers_by_user.setdefault(scheduler["user_id"], set()).add(scheduler["id"])
+        self._schedule(scheduler["id"], next_run_timestamp(scheduler))
+
+    def _schedule(self, scheduler_id: str, next_run_at: Optional[float]):
+        if next_run_at is None:
+            self._next_run.pop(scheduler_id, None)
+            return
+        self._next_run[scheduler_id] = next_run_at
+        heapq.heappush(self._due_heap, (next_run_at, scheduler_id))
+
+    def _unindex_scheduler(self, scheduler_id: str):
+        scheduler = self._schedulers.pop(scheduler_id, None)
+        if scheduler is None:
+            return
+        self._schedulers_by_user.get(scheduler["user_id"], set()).discard(scheduler_id)
+        self._next_run.pop(scheduler_id, None)
+
+    @staticmethod
+    def _public_user(user: Dict) -> Dict:
+        return {
+            "id": user["id"],
+            "email": user["email"],
+            "name": user["name"],
+            "created_at": user["created_at"]
+        }
+
+    # -- repository API ----------------------------------------------------
+
+    def load_users(self) -> Dict:
+        with self._lock:
+            return copy.deepcopy(self._users_by_email)
+
+    def create_user(self, email: str, name: str, password_hash: str) -> Optional[Dict]:
+        with self._lock:
+            if email in self._users_by_email:
+                return None
+            user = {
+                "id": str(uuid.uuid4()),
+                "email": email,
+                "name": name,
+                "password_hash": password_hash,
+                "created_at": datetime.now().isoformat()
+            }
+            self._record({"op": "put_user", "user": user})
+            return self._public_user(user)
+
+    def authenticate_user(self, email: str, password_hash: str) -> Optional[Dict]:
+        with self._lock:
+            user = self._users_by_email.get(email)
+            if user is None or user["password_hash"] != password_hash:
+                return None
+            return self._public_user(user)
+
+    def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            user = self._users_by_id.get(user_id)
+            return self._public_user(user) if user else None
+
+    def load_schedulers(self) -> Dict:
+        with self._lock:
+            return copy.deepcopy(self._schedulers)
+
+    def create_scheduler(self, user_id: str, prompt: str, trigger_time: str,
+                         symbols: List[str], is_active: bool = True,
+                         cron: Optional[str] = None, timezone: Optional[str] = None) -> Dict:
+        scheduler = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "prompt": prompt,
+            "trigger_time": trigger_time,
+            "cron": cron,
+            "timezone": timezone,
+            "symbols": list(symbols),
+            "is_active": is_active,
+            "created_at": datetime.now().isoformat()
+        }
+        with self._lock:
+            self._record({"op": "put_scheduler", "scheduler": scheduler,
+                          "next_run_at": next_run_timestamp(scheduler)})
+            return copy.deepcopy(scheduler)
+
+    def get_user_schedulers(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            schedulers = [self._schedulers[s] for s in self._schedulers_by_user.get(user_id, ())]
+            return copy.deepcopy(sorted(schedulers, key=lambda s: s["created_at"]))
+
+    def get_scheduler_by_id(self, scheduler_id: str) -> Optional[Dict]:
+        with self._lock:
+            scheduler = self._schedulers.get(scheduler_id)
+            return copy.deepcopy(scheduler) if scheduler else None
+
+    def update_scheduler(self, scheduler_id: str, updates: Dict) -> Optional[Dict]:
+        with self._lock:
+            if scheduler_id not in self._schedulers:
+                return None
+            before = self._schedulers[scheduler_id]
+            scheduler = {**copy.deepcopy(before), **updates, "id": scheduler_id}
+            changed = schedule_changed(before, scheduler)
+            self._record({"op": "put_scheduler", "scheduler": scheduler,
+                          "next_run_at": next_run_timestamp(scheduler) if changed else self._next_run.get(scheduler_id)})
+            return copy.deepcopy(scheduler)
+
+    def delete_scheduler(self, scheduler_id: str) -> bool:
+        with self._lock:
+            if scheduler_id not in self._schedulers:
+                return False
+            self._record({"op": "delete_scheduler", "id": scheduler_id})
+            return True
+
+    def find_due_schedulers(self, now: float) -> List[Tuple[Dict, float]]:
+        due, seen = [], set()
+        with self._lock:
+            while self._due_heap and self._due_heap[0][0] <= now:
+                next_run_at, scheduler_id = heapq.heappop(self._due_heap)
+                if self._next_run.get(scheduler_id) != next_run_at or scheduler_id in seen:
+                    continue
+                seen.add(scheduler_id)
+                due.append((copy.deepcopy(self._schedulers[scheduler_id]), next_run_at))
+            # Only looked at: the entries stay due until advance_schedulers moves them.
+            for scheduler, next_run_at in due:
+                heapq.heappush(self._due_heap, (next_run_at, scheduler["id"]))
+        return due
+
+    def advance_schedulers(self, due: List[Tuple[Dict, float]], now: float):
+        with self._lock:
+            for scheduler, due_at in due:
+                if self._next_run.get(scheduler["id"]) != due_at:
+                    continue  # edited or deleted since it was found
+                self._record({"op": "schedule", "id": scheduler["id"],
+                              "next_run_at": next_run_timestamp(self._schedulers[scheduler["id"]], now)})
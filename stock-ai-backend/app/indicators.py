@@ -0,0 +1,231 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from .bar_store import bar_store
+
+load_dotenv()
+
+SMA_WINDOWS = (20, 50, 200)
+RSI_PERIOD = 14
+MACD_SPANS = (12, 26, 9)
+
+
+class IndicatorState:
+    """Rolling indicator state for one symbol, advanced one daily close at a time.
+
+    Holds running sums for each SMA window, Wilder's RSI averages and the MACD EMAs,
+    so adding a bar is O(1) regardless of the lookback.
+    """
+
+    def __init__(self):
+        self.closes: deque = deque(maxlen=max(SMA_WINDOWS))
+        self.sums = {window: 0.0 for window in SMA_WINDOWS}
+        self.count = 0
+        self.last_date: Optional[pd.Timestamp] = None
+        self.last_close: Optional[float] = None
+        self.deltas = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.ema_fast: Optional[float] = None
+        self.ema_slow: Optional[float] = None
+        self.signal: Optional[float] = None
+
+    def _advance(self, close: float) -> Dict[str, Any]:
+        """The scalar state after one more close, without mutating this state."""
+        n = self.count + 1
+        sums = {}
+        for window, total in self.sums.items():
+            total += close
+            if self.count >= window:
+                total -= self.closes[-window]
+            sums[window] = total
+
+        deltas, avg_gain, avg_loss = self.deltas, self.avg_gain, self.avg_loss
+        if self.last_close is not None:
+            change = close - self.last_close
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            deltas += 1
+            if deltas <= RSI_PERIOD:
+                # Seed with the simple mean of the first RSI_PERIOD changes, then smooth.
+                avg_gain += gain / RSI_PERIOD
+                avg_loss += loss / RSI_PERIOD
+            else:
+                avg_gain = (avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+                avg_loss = (avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+
+        fast_span, slow_span, signal_span = MACD_SPANS
+        ema_fast = close if self.ema_fast is None else self.ema_fast + 2 / (fast_span + 1) * (close - self.ema_fast)
+        ema_slow = close if self.ema_slow is None else self.ema_slow + 2 / (slow_span + 1) * (close - self.ema_slow)
+        macd = ema_fast - ema_slow
+        signal = macd if self.signal is None else self.signal + 2 / (signal_span + 1) * (macd - self.signal)
+
+        return {
+            "count": n, "sums": sums, "deltas": deltas, "avg_gain": avg_gain, "avg_loss": avg_loss,
+            "ema_fast": ema_fast, "ema_slow": ema_slow, "signal": signal
+        }
+
+    @staticmethod
+    def _values(close: float, step: Dict[str, Any]) -> Dict[str, Any]:
+        rsi = None
+        if step["deltas"] >= RSI_PERIOD:
+            if step["avg_loss"] == 0:
+                rsi = 100.0 if step["avg_gain"] > 0 else 50.0
+            else:
+                rsi = 100 - 100 / (1 + step["avg_gain"] / step["avg_loss"])
+
+        values = {"current_price": close}
+        for window, total in step["sums"].items():
+            values[f"sma_{window}"] = total / window if step["count"] >= window else None
+        values.update({
+            "rsi": rsi,
+            "macd": step["ema_fast"] - step["ema_slow"],
+            "macd_signal": step["signal"],
+            "bars": step["count"]
+        })
+        return values
+
+    def commit(self, date: pd.Timestamp, close: float):
+        step = self._advance(close)
+        self.count = step["count"]
+        self.sums = step["sums"]
+        self.deltas, self.avg_gain, self.avg_loss = step["deltas"], step["avg_gain"], step["avg_loss"]
+        self.ema_fast, self.ema_slow, self.signal = step["ema_fast"], step["ema_slow"], step["signal"]
+        self.closes.append(close)
+        self.last_date = date
+        self.last_close = close
+
+    def peek(self, close: float) -> Dict[str, Any]:
+        """Indicator values if ``close`` were the next bar; used for the still-forming latest bar."""
+        return self._values(close, self._advance(close))
+
+
+class IndicatorEngine:
+    """Per-symbol indicator state kept warm between calls.
+
+    Only completed bars are committed; the latest bar (which may still be trading) is
+    applied with ``peek`` on every call. A warm symbol only processes the bars after its
+    last committed one (read from the local bar store, which syncs just the tail). The
+    full ``lookback`` is replayed on a cold start, or when a changed back-adjusted close
+    (after a dividend or split) shows the old state is stale. State and per-symbol locks
+    are kept for the ``max_symbols`` most recently used symbols.
+    """
+
+    def __init__(self, lookback: str = "1y", max_symbols: int = 1000):
+        self.lookback = lookback
+        self.max_symbols = max_symbols
+        self._states: "OrderedDict[str, IndicatorState]" = OrderedDict()
+        self._locks: "OrderedDict[str, threading.Lock]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"cold_starts": 0, "recomputes": 0, "incremental": 0, "bars_committed": 0,
+                         "evictions": 0}
+
+    def _history(self, symbol: str) -> pd.DataFrame:
+        hist = bar_store.history(symbol, period=self.lookback, interval="1d")
+        return hist[hist["Close"].notna()]
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+    @contextmanager
+    def _symbol_locked(self, symbol: str) -> Iterator[None]:
+        """Hold ``symbol``'s lock; retried if the lock was evicted before it was acquired."""
+        while True:
+            with self._lock:
+                lock = self._locks.setdefault(symbol, threading.Lock())
+                self._locks.move_to_end(symbol)
+                for other in list(self._locks)[:max(len(self._locks) - self.max_symbols, 0)]:
+                    if not self._locks[other].locked():
+                        del self._locks[other]
+            lock.acquire()
+            with self._lock:
+                if self._locks.get(symbol) is lock:
+                    break
+            lock.release()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def _store(self, symbol: str, state: IndicatorState):
+        with self._lock:
+            self._states[symbol] = state
+            self._states.move_to_end(symbol)
+            while len(self._states) > self.max_symbols:
+                self._states.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+    def _rebuild(self, symbol: str) -> Tuple[Optional[IndicatorState], pd.DataFrame]:
+        hist = self._history(symbol)
+        if hist.empty:
+            return None, hist
+        state = IndicatorState()
+        closes = hist["Close"].to_numpy(dtype=float)
+        for date, close in zip(hist.index[:-1], closes[:-1]):
+            state.commit(date, float(close))
+        self._count("bars_committed", len(closes) - 1)
+        return state, hist.iloc[-1:]
+
+    def _catch_up(self, symbol: str, state: IndicatorState) -> Optional[pd.DataFrame]:
+        """Bars after the committed state (at least the latest), or None if it must be rebuilt."""
+        hist = self._history(symbol)
+        overlap = hist[hist.index == state.last_date]
+        if overlap.empty or not np.isclose(overlap["Close"].iloc[0], state.last_close, rtol=1e-4):
+            return None
+        new_bars = hist[hist.index > state.last_date]
+        if new_bars.empty:
+            return None
+        return new_bars
+
+    def snapshot(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Current indicator values for ``symbol``, or None if there is no price history."""
+        symbol = symbol.upper()
+        with self._symbol_locked(symbol):
+            with self._lock:
+                state = self._states.get(symbol)
+            new_bars = self._catch_up(symbol, state) if state is not None else None
+
+            if new_bars is None:
+                self._count("recomputes" if state is not None else "cold_starts")
+                state, new_bars = self._rebuild(symbol)
+                if state is None:
+                    with self._lock:
+                        self._states.pop(symbol, None)
+                    return None
+            else:
+                self._count("incremental")
+
+            closes = new_bars["Close"].to_numpy(dtype=float)
+            for date, close in zip(new_bars.index[:-1], closes[:-1]):
+                state.commit(date, float(close))
+            self._count("bars_committed", max(len(closes) - 1, 0))
+            self._store(symbol, state)
+
+            values = state.peek(float(closes[-1]))
+
+        values["as_of"] = new_bars.index[-1].strftime("%Y-%m-%d")
+        return values
+
+    def reset(self, symbol: Optional[str] = None):
+        """Drop cached state so the next call recomputes from the full lookback."""
+        with self._lock:
+            if symbol is None:
+                self._states.clear()
+            else:
+                self._states.pop(symbol.upper(), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._metrics, "symbols": len(self._states), "max_symbols": self.max_symbols,
+                    "lookback": self.lookback}
+
+
+indicator_engine = IndicatorEngine(
+    lookback=os.getenv("TECHNICALS_LOOKBACK", "1y"),
+    max_symbols=int(os.getenv("TECHNICALS_MAX_SYMBOLS", "1000"))
+)
@@ -0,0 +1,278 @@
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from .database import ConnectionPool, DATA_DIR
+
+load_dotenv()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    run_id TEXT NOT NULL,
+    scheduler_id TEXT NOT NULL,
+    shard_key INTEGER NOT NULL DEFAULT 0,
+    trigger_time TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_alert_jobs_run_status ON alert_jobs (run_id, status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_alert_jobs_status ON alert_jobs (status);
+
+CREATE TABLE IF NOT EXISTS alert_workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+class AlertJobQueue:
+    """Persistent SQLite queue of alert jobs, one per (scheduler, run).
+
+    Jobs are claimed under a lease so a crashed worker's jobs become claimable again,
+    failures are retried with exponential backoff, and jobs that exhaust their attempts
+    are dead-lettered. The idempotency key makes re-enqueueing a run a no-op.
+
+    Processes sharing the queue heartbeat into ``alert_workers``; each job carries a
+    stable hash of its scheduler id so a run can be split between the live workers.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5, backoff_base: float = 30,
+                 backoff_max: float = 900, retention_days: float = 7):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._pool: Optional[ConnectionPool] = None
+        self._init_lock = threading.Lock()
+
+    def _get_pool(self) -> ConnectionPool:
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    pool = ConnectionPool(self.path, 4)
+                    with pool.connection() as conn:
+                        conn.executescript(SCHEMA)
+                        columns = {row["name"] for row in conn.execute("PRAGMA table_info(alert_jobs)")}
+                        if "shard_key" not in columns:
+                            conn.execute("ALTER TABLE alert_jobs ADD COLUMN shard_key INTEGER NOT NULL DEFAULT 0")
+                    self._pool = pool
+        return self._pool
+
+    def _write(self, statements):
+        with self._get_pool().connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(conn)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._get_pool().connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _job_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        job = dict(row)
+        job["scheduler"] = json.loads(job.pop("payload"))
+        return job
+
+    @staticmethod
+    def shard_key(scheduler_id: str) -> int:
+        return zlib.crc32(str(scheduler_id).encode())
+
+    def enqueue_run(self, run_id: str, trigger_time: str, schedulers: List[Dict]) -> int:
+        """Enqueue one job per scheduler; jobs already enqueued for this run are skipped."""
+        now = datetime.now().isoformat()
+
+        def insert(conn):
+            inserted = 0
+            for scheduler in schedulers:
+                cursor = conn.execute(
+                    """INSERT OR IGNORE INTO alert_jobs
+                       (idempotency_key, run_id, scheduler_id, shard_key, trigger_time, payload,
+                        max_attempts, next_attempt_at, created_at, updated_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (f"{scheduler['id']}:{run_id}", run_id, scheduler["id"],
+                     self.shard_key(scheduler["id"]), trigger_time,
+                     json.dumps(scheduler, default=str), self.max_attempts, time.time(), now, now)
+                )
+                inserted += cursor.rowcount
+            return inserted
+
+        return self._write(insert)
+
+    def claim(self, run_id: str, lease_seconds: float, shard: Tuple[int, int] = (1, 0),
+              steal_shards: Sequence[int] = ()) -> Optional[Dict[str, Any]]:
+        """Lease the next ready job of a run, including jobs whose previous lease expired.
+
+        ``shard`` is ``(count, index)``: only that shard's pending jobs are taken, plus
+        those of the ``steal_shards`` indexes, whose owners the caller found to be gone.
+        """
+        now = time.time()
+        count, index = shard
+        stealable = ", ".join("?" * len(steal_shards))
+
+        def take(conn):
+            row = conn.execute(
+                f"""SELECT * FROM alert_jobs
+                   WHERE run_id = ?
+                     AND ((status = 'pending' AND next_attempt_at <= ?
+                           AND (shard_key % ? = ? OR shard_key % ? IN ({stealable})))
+                          OR (status = 'running' AND lease_expires_at <= ?))
+                   ORDER BY shard_key % ? = ? DESC, next_attempt_at, id
+                   LIMIT 1""",
+                (run_id, now, count, index, count, *steal_shards, now, count, index)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """UPDATE alert_jobs SET status = 'running', attempts = attempts + 1,
+                   lease_expires_at = ?, updated_at = ? WHERE id = ?""",
+                (now + lease_seconds, datetime.now().isoformat(), row["id"])
+            )
+            job = self._job_from_row(dict(row))
+            job["attempts"] += 1
+            return job
+
+        return self._write(take)
+
+    def complete(self, job_id: int):
+        self._write(lambda conn: conn.execute(
+            "UPDATE alert_jobs SET status = 'done', lease_expires_at = NULL, last_error = NULL, updated_at = ? WHERE id = ?",
+            (datetime.now().isoformat(), job_id)
+        ))
+
+    def fail(self, job: Dict[str, Any], error: str) -> bool:
+        """Record a failed attempt; returns True if the job was dead-lettered."""
+        dead = job["attempts"] >= job["max_attempts"]
+        delay = min(self.backoff_base * 2 ** (job["attempts"] - 1), self.backoff_max)
+        delay *= random.uniform(0.8, 1.2)
+        self._write(lambda conn: conn.execute(
+            """UPDATE alert_jobs SET status = ?, next_attempt_at = ?, lease_expires_at = NULL,
+               last_error = ?, updated_at = ? WHERE id = ?""",
+            ("dead" if dead else "pending", time.time() + delay, error[:1000],
+             datetime.now().isoformat(), job["id"])
+        ))
+        return dead
+
+    def outstanding(self, run_id: str) -> Dict[str, Any]:
+        """Count a run's unfinished jobs and when the earliest of them can next be claimed."""
+        row = self._read(
+            """SELECT COUNT(*) AS remaining,
+                      MIN(CASE WHEN status = 'pending' THEN next_attempt_at ELSE lease_expires_at END) AS next_ready_at
+               FROM alert_jobs WHERE run_id = ? AND status IN ('pending', 'running')""",
+            (run_id,)
+        )[0]
+        return row
+
+    def run_schedulers(self, run_id: str, shard: Tuple[int, int] = (1, 0)) -> List[Dict]:
+        """Scheduler snapshots for a run's unfinished jobs in the given ``(count, index)`` shard."""
+        rows = self._read(
+            """SELECT payload FROM alert_jobs
+               WHERE run_id = ? AND status IN ('pending', 'running') AND shard_key % ? = ?""",
+            (run_id, *shard)
+        )
+        return [json.loads(row["payload"]) for row in rows]
+
+    def unfinished_runs(self) -> List[Dict[str, str]]:
+        return self._read(
+            """SELECT run_id, MIN(trigger_time) AS trigger_time FROM alert_jobs
+               WHERE status IN ('pending', 'running') GROUP BY run_id ORDER BY MIN(created_at)"""
+        )
+
+    def heartbeat(self, worker_id: str):
+        self._write(lambda conn: conn.execute(
+            """INSERT INTO alert_workers (worker_id, heartbeat_at) VALUES (?, ?)
+               ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at""",
+            (worker_id, time.time())
+        ))
+
+    def remove_worker(self, worker_id: str):
+        self._write(lambda conn: conn.execute("DELETE FROM alert_workers WHERE worker_id = ?", (worker_id,)))
+
+    def live_workers(self, ttl: float) -> List[str]:
+        """Ids of workers that have heartbeated within ``ttl`` seconds, in a stable order."""
+        rows = self._read(
+            "SELECT worker_id FROM alert_workers WHERE heartbeat_at >= ? ORDER BY worker_id",
+            (time.time() - ttl,)
+        )
+        return [row["worker_id"] for row in rows]
+
+    def purge(self, worker_ttl: float) -> Dict[str, int]:
+        """Delete jobs finished more than ``retention_days`` ago and workers whose heartbeat expired.
+
+        Dead-lettered jobs are kept until they are retried.
+        """
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+
+        def delete(conn):
+            jobs = conn.execute(
+                "DELETE FROM alert_jobs WHERE status = 'done' AND updated_at < ?", (cutoff,)
+            ).rowcount
+            workers = conn.execute(
+                "DELETE FROM alert_workers WHERE heartbeat_at < ?", (time.time() - worker_ttl,)
+            ).rowcount
+            return {"jobs": jobs, "workers": workers}
+
+        return self._write(delete)
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._read(
+            "SELECT * FROM alert_jobs WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?",
+            (limit,)
+        )
+        return [self._job_from_row(row) for row in rows]
+
+    def requeue(self, job_id: int) -> bool:
+        """Move a dead-lettered job back to pending with a fresh set of attempts."""
+        def reset(conn):
+            cursor = conn.execute(
+                """UPDATE alert_jobs SET status = 'pending', attempts = 0, next_attempt_at = ?,
+                   updated_at = ? WHERE id = ? AND status = 'dead'""",
+                (time.time(), datetime.now().isoformat(), job_id)
+            )
+            return cursor.rowcount > 0
+        return self._write(reset)
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._read("SELECT * FROM alert_jobs WHERE id = ?", (job_id,))
+        return self._job_from_row(rows[0]) if rows else None
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._read("SELECT status, COUNT(*) AS count FROM alert_jobs GROUP BY status")
+        counts = {"pending": 0, "running": 0, "done": 0, "dead": 0}
+        counts.update({row["status"]: row["count"] for row in rows})
+        return counts
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+
+job_queue = AlertJobQueue(
+    os.getenv("JOB_QUEUE_PATH", os.path.join(DATA_DIR, "alert_jobs.db")),
+    max_attempts=int(os.getenv("ALERT_MAX_ATTEMPTS", "5")),
+    backoff_base=float(os.getenv("ALERT_RETRY_BACKOFF", "30")),
+    retention_days=float(os.getenv("ALERT_JOB_RETENTION_DAYS", "7"))
+)
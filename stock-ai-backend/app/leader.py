@@ -0,0 +1,50 @@
+import fcntl
+import os
+from typing import Optional
+from dotenv import load_dotenv
+from .database import DATA_DIR
+
+load_dotenv()
+
+
+class LeaderLock:
+    """Non-blocking exclusive file lock; the process holding it is the scheduling leader.
+
+    The kernel drops the lock when the holding process exits, so a surviving worker
+    can take over on its next attempt.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+leader_lock = LeaderLock(os.getenv("SCHEDULER_LOCK_PATH", os.path.join(DATA_DIR, "scheduler.lock")))
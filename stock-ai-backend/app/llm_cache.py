@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from .database import ConnectionPool, DATA_DIR
+from .market_hours import is_market_open, seconds_until_open
+
+load_dotenv()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_responses_expires ON llm_responses (expires_at);
+"""
+
+
+# Stamps of when a payload was assembled rather than what it says; they change on every
+# recompute (and differ between workers) while the data is the same.
+VOLATILE_FIELDS = {"analysis_date", "fetched_at", "generated_at", "age_seconds", "last_updated", "cached"}
+
+
+def _canonical(value: Any, digits: int) -> Any:
+    """Sorted-key, number-rounded form of a payload without volatile stamps, so equivalent data hashes equally."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v, digits) for k, v in sorted(value.items(), key=lambda item: str(item[0]))
+                if k not in VOLATILE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v, digits) for v in value]
+    if isinstance(value, bool) or value is None or not isinstance(value, (int, float)):
+        return value
+    if digits <= 0 or not math.isfinite(value) or value == 0:
+        return value
+    return float(f"{value:.{digits}g}")
+
+
+class LLMResponseCache:
+    """Two-tier cache of model completions keyed by model, system prompt and data fingerprint.
+
+    Entries live in a bounded in-memory LRU backed by a SQLite table, so answers survive a
+    restart. While the market is open entries expire after ``open_ttl``; outside trading
+    hours the data is frozen, so they last until the next open (at most ``closed_ttl``).
+    The fingerprint rounds numbers to ``significant_digits`` so quote ticks smaller than
+    that do not force a new completion, and ignores ``VOLATILE_FIELDS`` timestamps. Concurrent misses for one key share a single call.
+    """
+
+    def __init__(self, path: str, open_ttl: float = 300, closed_ttl: float = 43200,
+                 significant_digits: int = 3, max_entries: int = 512):
+        self.path = path
+        self.open_ttl = open_ttl
+        self.closed_ttl = closed_ttl
+        self.significant_digits = significant_digits
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ConnectionPool] = None
+        self._init_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "stores": 0}
+
+    def _get_pool(self) -> ConnectionPool:
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    pool = ConnectionPool(self.path, 2)
+                    with pool.connection() as conn:
+                        conn.executescript(SCHEMA)
+                    self._pool = pool
+        return self._pool
+
+    def fingerprint(self, model: str, system_prompt: str, kind: str, payload: Any) -> str:
+        canonical = json.dumps({
+            "model": model,
+            "system": system_prompt,
+            "kind": kind,
+            "data": _canonical(payload, self.significant_digits)
+        }, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def ttl(self) -> float:
+        """Seconds a completion stored now stays fresh."""
+        if is_market_open():
+            return self.open_ttl
+        return min(max(seconds_until_open(), self.open_ttl), self.closed_ttl)
+
+    # -- tiers -------------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry[1]
+
+    def _memory_set(self, key: str, expires_at: float, content: str):
+        with self._lock:
+            self._memory[key] = (expires_at, content)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._get_pool().connection() as conn:
+            row = conn.execute(
+                "SELECT expires_at, content FROM llm_responses WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return (row["expires_at"], row["content"]) if row else None
+
+    def _disk_set(self, key: str, kind: str, content: str, expires_at: float):
+        with self._get_pool().connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, kind, content, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, content, time.time(), expires_at)
+            )
+
+    def purge_expired(self) -> int:
+        with self._get_pool().connection() as conn:
+            return conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def clear(self, kind: Optional[str] = None) -> int:
+        with self._lock:
+            self._memory.clear()
+        with self._get_pool().connection() as conn:
+            if kind is None:
+                return conn.execute("DELETE FROM llm_responses").rowcount
+            return conn.execute("DELETE FROM llm_responses WHERE kind = ?", (kind,)).rowcount
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    # -- lookup ------------------------------------------------------------
+
+    async def get_or_create(self, key: str, kind: str,
+                            create: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+        """Return ``(content, cached)``, calling ``create`` only on a miss."""
+        content = self._memory_get(key)
+        if content is not None:
+            self._metrics["memory_hits"] += 1
+            return content, True
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._metrics["coalesced"] += 1
+            return await asyncio.shield(pending), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            stored = await asyncio.to_thread(self._disk_get, key)
+            if stored is not None:
+                self._metrics["disk_hits"] += 1
+                self._memory_set(key, *stored)
+                future.set_result(stored[1])
+                return stored[1], True
+
+            self._metrics["misses"] += 1
+            content = await create()
+            if content:
+                expires_at = time.time() + self.ttl()
+                self._memory_set(key, expires_at, content)
+                await asyncio.to_thread(self._disk_set, key, kind, content, expires_at)
+                self._metrics["stores"] += 1
+            future.set_result(content)
+            return content, False
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # waiters get the error; avoid "never retrieved" warnings
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._metrics["memory_hits"] + self._metrics["disk_hits"] + self._metrics["misses"]
+        hits = lookups - self._metrics["misses"]
+        return {
+            **self._metrics,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "market_open": is_market_open(),
+            "current_ttl_seconds": round(self.ttl()),
+        }
+
+
+llm_cache = LLMResponseCache(
+    os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.db")),
+    open_ttl=float(os.getenv("LLM_CACHE_TTL_OPEN", "300")),
+    closed_ttl=float(os.getenv("LLM_CACHE_TTL_CLOSED", "43200")),
+    significant_digits=int(os.getenv("LLM_CACHE_SIGNIFICANT_DIGITS", "3")),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+)
@@ -1,33 +1,53 @@
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from contextlib import asynccontextmanager
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import json
 import os
 
 from .models import (
     UserCreate, UserResponse, UserLogin, ChatRequest, ChatResponse,
-    StockQuery, MarketQuery, SchedulerCreate, SchedulerResponse,
+    StockQuery, MarketQuery, ScreenerRequest, SchedulerCreate, SchedulerResponse,
     StockRecommendation, MarketSummary, TriggerTime
 )
 from .database import (
     create_user, authenticate_user, get_user_by_id,
     create_scheduler, get_user_schedulers, get_scheduler_by_id,
-    update_scheduler, delete_scheduler
+    update_scheduler, delete_scheduler, close_database
 )
-from .mcp_tools import mcp_tools
+from .async_tools import async_tools
+from .cache import market_cache
+from .singleflight import market_flight
 from .ai_service import ai_analyst
+from .ai_refresher import ai_refresher
+from .chat_sessions import chat_sessions
 from .email_service import email_service
 from .scheduler_service import scheduler_service
+from .alert_engine import alert_engine
+from .job_queue import job_queue
+from .indicators import indicator_engine
+from .bar_store import INTERVALS, bar_store
+from .llm_cache import llm_cache
+from .screener import FIELDS as SCREENER_FIELDS
+from .mcp_tools import HISTORY_FORMATS
+from .schedule import schedule_fields
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     scheduler_service.start()
+    await asyncio.to_thread(llm_cache.purge_expired)
     yield
-    scheduler_service.stop()
+    await scheduler_service.stop()
+    await email_service.close()
+    async_tools.shutdown()
+    close_database()
+    job_queue.close()
+    llm_cache.close()
 
 
 app = FastAPI(
@@ -98,31 +118,86 @@ async def login(credentials: UserLogin):
     }
 
 
+def _chat_context(request: ChatRequest):
+    """History and session for a chat request.
+
+    With a ``session_id`` the server-side session is used; the client's history only seeds a
+    new session when that one is unknown to this worker. History without a session id is the
+    legacy stateless mode.
+    """
+    history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history or []]
+    if history and not request.session_id:
+        return history, None
+    return None, chat_sessions.open(request.session_id, history)
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
-    conversation_history = [
-        {"role": msg.role, "content": msg.content}
-        for msg in (request.conversation_history or [])
-    ]
+    conversation_history, session = _chat_context(request)
     
     result = await ai_analyst.chat(
         message=request.message,
         symbol=request.symbol,
-        conversation_history=conversation_history
+        conversation_history=conversation_history,
+        session=session
     )
     
     return ChatResponse(
         response=result["response"],
         symbol=result.get("symbol"),
-        data=result.get("data")
+        data=result.get("data"),
+        usage=result.get("usage"),
+        session_id=result.get("session_id")
+    )
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    conversation_history, session = _chat_context(request)
+    
+    async def event_stream():
+        async for event in ai_analyst.chat_stream(
+            message=request.message,
+            symbol=request.symbol,
+            conversation_history=conversation_history,
+            session=session
+        ):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+@app.get("/api/chat/sessions")
+async def get_chat_session_stats():
+    return chat_sessions.stats()
+
+
+@app.get("/api/chat/sessions/{session_id}")
+async def get_chat_session(session_id: str):
+    session = chat_sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session.id, "summary": session.summary, "turns": session.turns}
+
+
+@app.delete("/api/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    if not chat_sessions.close(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": "Session closed"}
+
+
 @app.get("/api/market/summary")
 async def get_market_summary():
     try:
-        indices = mcp_tools.get_market_indices()
-        movers = mcp_tools.get_top_movers("stocks", 5)
+        indices, movers = await asyncio.gather(
+            async_tools.get_market_indices(),
+            async_tools.get_top_movers("stocks", 5)
+        )
         
         return {
             "market_status": "open" if datetime.now().hour >= 9 and datetime.now().hour < 16 else "closed",
@@ -138,7 +213,7 @@ async def get_market_summary():
 @app.get("/api/market/ai-summary")
 async def get_ai_market_summary():
     try:
-        result = await ai_analyst.generate_market_summary()
+        result = await ai_refresher.market_summary()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -147,7 +222,7 @@ async def get_ai_market_summary():
 @app.get("/api/market/indices")
 async def get_indices():
     try:
-        indices = mcp_tools.get_market_indices()
+        indices = await async_tools.get_market_indices()
         return {"indices": indices}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -156,16 +231,38 @@ async def get_indices():
 @app.get("/api/market/movers")
 async def get_movers(market_type: str = "stocks", limit: int = 10):
     try:
-        movers = mcp_tools.get_top_movers(market_type, limit)
+        movers = await async_tools.get_top_movers(market_type, limit)
         return movers
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/screener")
+async def screen_stocks(request: ScreenerRequest):
+    try:
+        result = await async_tools.screen_stocks(
+            request.symbols, request.filter, request.rank_by, request.descending, request.limit
+        )
+        if "error" in result:
+            raise HTTPException(status_code=502, detail=result["error"])
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/screener/fields")
+async def get_screener_fields():
+    return {"fields": SCREENER_FIELDS}
+
+
 @app.get("/api/stocks/{symbol}")
 async def get_stock_info(symbol: str):
     try:
-        info = mcp_tools.get_stock_info(symbol)
+        info = await async_tools.get_stock_info(symbol)
         if "error" in info:
             raise HTTPException(status_code=404, detail=info["error"])
         return info
@@ -176,9 +273,13 @@ async def get_stock_info(symbol: str):
 
 
 @app.get("/api/stocks/{symbol}/history")
-async def get_stock_history(symbol: str, period: str = "1mo", interval: str = "1d"):
+async def get_stock_history(symbol: str, period: str = "1mo", interval: str = "1d", format: str = "records"):
+    if format not in HISTORY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(HISTORY_FORMATS)}")
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of: {', '.join(sorted(INTERVALS))}")
     try:
-        history = mcp_tools.get_historical_data(symbol, period, interval)
+        history = await async_tools.get_historical_data(symbol, period, interval, format)
         if "error" in history:
             raise HTTPException(status_code=404, detail=history["error"])
         return history
@@ -191,7 +292,7 @@ async def get_stock_history(symbol: str, period: str = "1mo", interval: str = "1
 @app.get("/api/stocks/{symbol}/news")
 async def get_stock_news(symbol: str):
     try:
-        news = mcp_tools.get_stock_news(symbol)
+        news = await async_tools.get_stock_news(symbol)
         return {"symbol": symbol, "news": news}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -200,7 +301,7 @@ async def get_stock_news(symbol: str):
 @app.get("/api/stocks/{symbol}/technicals")
 async def get_stock_technicals(symbol: str):
     try:
-        technicals = mcp_tools.analyze_stock_technicals(symbol)
+        technicals = await async_tools.analyze_stock_technicals(symbol)
         if "error" in technicals:
             raise HTTPException(status_code=404, detail=technicals["error"])
         return technicals
@@ -213,7 +314,7 @@ async def get_stock_technicals(symbol: str):
 @app.get("/api/stocks/{symbol}/financials")
 async def get_stock_financials(symbol: str):
     try:
-        financials = mcp_tools.get_financials(symbol)
+        financials = await async_tools.get_financials(symbol)
         if "error" in financials:
             raise HTTPException(status_code=404, detail=financials["error"])
         return financials
@@ -226,7 +327,7 @@ async def get_stock_financials(symbol: str):
 @app.get("/api/stocks/{symbol}/recommendations")
 async def get_stock_recommendations(symbol: str):
     try:
-        recommendations = mcp_tools.get_recommendations(symbol)
+        recommendations = await async_tools.get_recommendations(symbol)
         return recommendations
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -235,7 +336,7 @@ async def get_stock_recommendations(symbol: str):
 @app.get("/api/stocks/{symbol}/ai-analysis")
 async def get_ai_stock_analysis(symbol: str):
     try:
-        result = await ai_analyst.generate_stock_recommendation(symbol)
+        result = await ai_refresher.stock_analysis(symbol)
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         return result
@@ -248,31 +349,64 @@ async def get_ai_stock_analysis(symbol: str):
 @app.get("/api/search")
 async def search_stocks(query: str, limit: int = 10):
     try:
-        results = mcp_tools.search_stocks(query, limit)
+        results = await async_tools.search_stocks(query, limit)
         return {"query": query, "results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/email/stats")
+async def get_email_stats():
+    return email_service.stats()
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return {
+        **market_cache.stats(),
+        "singleflight": market_flight.stats(),
+        "indicators": indicator_engine.stats(),
+        "bar_store": bar_store.stats(),
+        "llm": llm_cache.stats(),
+        "ai_refresher": ai_refresher.stats()
+    }
+
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(kind: Optional[str] = None, symbol: Optional[str] = None):
+    removed = market_cache.invalidate(kind=kind, symbol=symbol)
+    return {"removed": removed, "kind": kind, "symbol": symbol}
+
+
+@app.post("/api/cache/llm/clear")
+async def clear_llm_cache(kind: Optional[str] = None):
+    removed = await asyncio.to_thread(llm_cache.clear, kind)
+    return {"removed": removed, "kind": kind}
+
+
 @app.post("/api/scheduler")
 async def create_scheduler_endpoint(scheduler: SchedulerCreate):
     user = get_user_by_id(scheduler.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    try:
+        schedule = schedule_fields(scheduler.trigger_time.value, scheduler.cron, scheduler.time, scheduler.timezone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     result = create_scheduler(
         user_id=scheduler.user_id,
         prompt=scheduler.prompt,
         trigger_time=scheduler.trigger_time.value,
         symbols=scheduler.symbols or [],
-        is_active=scheduler.is_active
+        is_active=scheduler.is_active,
+        **schedule
     )
     
-    next_runs = scheduler_service.get_next_run_times()
-    
     return {
         **result,
-        "next_run": next_runs.get(scheduler.trigger_time.value)
+        "next_run": scheduler_service.next_run(result)
     }
 
 
@@ -283,32 +417,77 @@ async def get_user_schedulers_endpoint(user_id: str):
         raise HTTPException(status_code=404, detail="User not found")
     
     schedulers = get_user_schedulers(user_id)
-    next_runs = scheduler_service.get_next_run_times()
     
     for s in schedulers:
-        s["next_run"] = next_runs.get(s["trigger_time"])
+        s["next_run"] = scheduler_service.next_run(s)
     
     return {"schedulers": schedulers}
 
 
+@app.get("/api/scheduler/next-runs")
+async def get_next_runs():
+    return scheduler_service.get_next_run_times()
+
+
+@app.get("/api/scheduler/runs")
+async def get_alert_runs():
+    return {
+        "worker_id": alert_engine.worker_id,
+        "is_leader": scheduler_service.is_leader,
+        "runs": alert_engine.get_runs()
+    }
+
+
+@app.get("/api/scheduler/jobs")
+async def get_alert_jobs():
+    return {
+        "counts": job_queue.stats(),
+        "dead_letters": job_queue.dead_letters()
+    }
+
+
+@app.post("/api/scheduler/jobs/{job_id}/retry")
+async def retry_alert_job(job_id: int, background_tasks: BackgroundTasks):
+    job = job_queue.get_job(job_id)
+    if not job or not job_queue.requeue(job_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered job not found")
+    
+    background_tasks.add_task(alert_engine.run, job["run_id"], job["trigger_time"])
+    return {"message": "Job requeued", "job_id": job_id, "run_id": job["run_id"]}
+
+
 @app.get("/api/scheduler/{scheduler_id}")
 async def get_scheduler_endpoint(scheduler_id: str):
     scheduler = get_scheduler_by_id(scheduler_id)
     if not scheduler:
         raise HTTPException(status_code=404, detail="Scheduler not found")
     
-    next_runs = scheduler_service.get_next_run_times()
-    scheduler["next_run"] = next_runs.get(scheduler["trigger_time"])
+    scheduler["next_run"] = scheduler_service.next_run(scheduler)
     
     return scheduler
 
 
 @app.put("/api/scheduler/{scheduler_id}")
 async def update_scheduler_endpoint(scheduler_id: str, updates: dict):
+    updates.pop("next_run", None)
+    if {"trigger_time", "cron", "time", "timezone"} & updates.keys():
+        current = get_scheduler_by_id(scheduler_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Scheduler not found")
+        time_of_day = updates.pop("time", None)
+        # A new time replaces the stored cron expression unless a cron is also given.
+        cron = updates.get("cron", None if time_of_day else current.get("cron"))
+        try:
+            schedule = schedule_fields(updates.get("trigger_time", current["trigger_time"]), cron,
+                                       time_of_day, updates.get("timezone", current.get("timezone")))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        updates.update(schedule)
+    
     result = update_scheduler(scheduler_id, updates)
     if not result:
         raise HTTPException(status_code=404, detail="Scheduler not found")
-    return result
+    return {**result, "next_run": scheduler_service.next_run(result)}
 
 
 @app.delete("/api/scheduler/{scheduler_id}")
@@ -327,11 +506,6 @@ async def test_scheduler_endpoint(scheduler_id: str):
     return result
 
 
-@app.get("/api/scheduler/next-runs")
-async def get_next_runs():
-    return scheduler_service.get_next_run_times()
-
-
 # Serve frontend static files
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "stock-ai-frontend")
 FRONTEND_DIR = os.path.abspath(FRONTEND_DIR)
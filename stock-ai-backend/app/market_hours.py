@@ -0,0 +1,35 @@
+import os
+from datetime import datetime, time, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MARKET_TIMEZONE = ZoneInfo(os.getenv("MARKET_TIMEZONE", "America/New_York"))
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+
+def _market_now(now: Optional[datetime] = None) -> datetime:
+    return now.astimezone(MARKET_TIMEZONE) if now else datetime.now(MARKET_TIMEZONE)
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """Whether the regular trading session is in progress (weekdays; exchange holidays are not modelled)."""
+    now = _market_now(now)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def next_market_open(now: Optional[datetime] = None) -> datetime:
+    """Start of the next regular session strictly after ``now``."""
+    now = _market_now(now)
+    day = now.date() if now.time() < MARKET_OPEN else now.date() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return datetime.combine(day, MARKET_OPEN, tzinfo=MARKET_TIMEZONE)
+
+
+def seconds_until_open(now: Optional[datetime] = None) -> float:
+    now = _market_now(now)
+    return max((next_market_open(now) - now).total_seconds(), 0.0)
@@ -1,14 +1,74 @@
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import json
+from .cache import cached
+from .bar_store import INTRADAY, bar_store
+from .indicators import indicator_engine
+
+
+# Universe for top movers and the default screener universe.
+STOCK_NAMES = {
+    "AAPL": "Apple Inc.", "MSFT": "Microsoft Corporation", "GOOGL": "Alphabet Inc.",
+    "AMZN": "Amazon.com, Inc.", "NVDA": "NVIDIA Corporation", "META": "Meta Platforms, Inc.",
+    "TSLA": "Tesla, Inc.", "BRK-B": "Berkshire Hathaway Inc.", "JPM": "JPMorgan Chase & Co.",
+    "JNJ": "Johnson & Johnson", "V": "Visa Inc.", "PG": "Procter & Gamble Company",
+    "UNH": "UnitedHealth Group Inc.", "HD": "Home Depot, Inc.", "MA": "Mastercard Inc.",
+    "DIS": "Walt Disney Company", "PYPL": "PayPal Holdings, Inc.", "NFLX": "Netflix, Inc.",
+    "ADBE": "Adobe Inc.", "CRM": "Salesforce, Inc.", "INTC": "Intel Corporation",
+    "AMD": "Advanced Micro Devices, Inc.", "CSCO": "Cisco Systems, Inc.", "PEP": "PepsiCo, Inc.",
+    "KO": "Coca-Cola Company", "NKE": "NIKE, Inc.", "MRK": "Merck & Co., Inc.", "PFE": "Pfizer Inc."
+}
+
+ETF_NAMES = {
+    "SPY": "SPDR S&P 500 ETF", "QQQ": "Invesco QQQ Trust", "IWM": "iShares Russell 2000 ETF",
+    "DIA": "SPDR Dow Jones Industrial Average ETF", "VTI": "Vanguard Total Stock Market ETF",
+    "VOO": "Vanguard S&P 500 ETF", "VEA": "Vanguard FTSE Developed Markets ETF",
+    "VWO": "Vanguard FTSE Emerging Markets ETF", "BND": "Vanguard Total Bond Market ETF",
+    "GLD": "SPDR Gold Shares", "SLV": "iShares Silver Trust", "USO": "United States Oil Fund",
+    "XLF": "Financial Select Sector SPDR", "XLE": "Energy Select Sector SPDR",
+    "XLK": "Technology Select Sector SPDR", "XLV": "Health Care Select Sector SPDR",
+    "XLI": "Industrial Select Sector SPDR", "XLP": "Consumer Staples Select Sector SPDR",
+    "XLU": "Utilities Select Sector SPDR", "ARKK": "ARK Innovation ETF"
+}
+
+
+HISTORY_FORMATS = ("records", "columns")
+RECOMMENDATION_COLUMNS = {"firm": "Firm", "to_grade": "To Grade", "from_grade": "From Grade", "action": "Action"}
+
+
+def format_dates(index: pd.Index, intraday: bool = False) -> List[str]:
+    """Format a whole index at once; non-datetime indexes are stringified."""
+    if isinstance(index, pd.DatetimeIndex):
+        return index.strftime("%Y-%m-%d %H:%M" if intraday else "%Y-%m-%d").tolist()
+    return index.astype(str).tolist()
+
+
+def history_columns(hist: pd.DataFrame, interval: str = "1d") -> Dict[str, List]:
+    """OHLCV frame as JSON-ready column lists, rounded and cast per column rather than per row."""
+    prices = hist[["Open", "High", "Low", "Close"]].to_numpy(dtype=float).round(2)
+    return {
+        "date": format_dates(hist.index, intraday=interval in INTRADAY),
+        "open": prices[:, 0].tolist(),
+        "high": prices[:, 1].tolist(),
+        "low": prices[:, 2].tolist(),
+        "close": prices[:, 3].tolist(),
+        "volume": hist["Volume"].fillna(0).to_numpy(dtype="int64").tolist()
+    }
+
+
+def columns_to_records(columns: Dict[str, List]) -> List[Dict[str, Any]]:
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
 
 
 class MCPStockTools:
     """MCP-based tools for stock data retrieval and analysis using yfinance."""
     
     @staticmethod
+    @cached("quote")
     def get_stock_info(symbol: str) -> Dict[str, Any]:
         """Get comprehensive stock information."""
         try:
@@ -45,39 +105,41 @@ class MCPStockTools:
             return {"error": str(e), "symbol": symbol}
 
     @staticmethod
-    def get_historical_data(symbol: str, period: str = "1mo", interval: str = "1d") -> Dict[str, Any]:
-        """Get historical price data for a stock."""
+    @cached("history")
+    def get_historical_data(symbol: str, period: str = "1mo", interval: str = "1d",
+                            format: str = "records") -> Dict[str, Any]:
+        """Get historical price data for a stock.
+
+        ``format="records"`` returns one dict per bar; ``format="columns"`` returns one list
+        per field (``{"date": [...], "close": [...]}``), which charts can use directly.
+        """
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period, interval=interval)
+            if format not in HISTORY_FORMATS:
+                return {"error": f"Unsupported format: {format}", "symbol": symbol}
+            hist = bar_store.history(symbol, period=period, interval=interval)
             
             if hist.empty:
                 return {"error": "No historical data available", "symbol": symbol}
             
-            data = []
-            for date, row in hist.iterrows():
-                data.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "open": round(row["Open"], 2),
-                    "high": round(row["High"], 2),
-                    "low": round(row["Low"], 2),
-                    "close": round(row["Close"], 2),
-                    "volume": int(row["Volume"])
-                })
+            columns = history_columns(hist, interval)
+            dates = columns["date"]
+            data = columns if format == "columns" else columns_to_records(columns)
             
             return {
                 "symbol": symbol.upper(),
                 "period": period,
                 "interval": interval,
+                "format": format,
                 "data": data,
-                "start_date": data[0]["date"] if data else None,
-                "end_date": data[-1]["date"] if data else None,
-                "data_points": len(data)
+                "start_date": dates[0] if dates else None,
+                "end_date": dates[-1] if dates else None,
+                "data_points": len(dates)
             }
         except Exception as e:
             return {"error": str(e), "symbol": symbol}
 
     @staticmethod
+    @cached("news")
     def get_stock_news(symbol: str) -> List[Dict[str, Any]]:
         """Get recent news for a stock."""
         try:
@@ -100,6 +162,7 @@ class MCPStockTools:
             return [{"error": str(e)}]
 
     @staticmethod
+    @cached("financials")
     def get_financials(symbol: str) -> Dict[str, Any]:
         """Get financial statements for a stock."""
         try:
@@ -131,6 +194,7 @@ class MCPStockTools:
             return {"error": str(e), "symbol": symbol}
 
     @staticmethod
+    @cached("financials")
     def get_recommendations(symbol: str) -> Dict[str, Any]:
         """Get analyst recommendations for a stock."""
         try:
@@ -140,15 +204,11 @@ class MCPStockTools:
             if recommendations is None or recommendations.empty:
                 return {"symbol": symbol, "recommendations": []}
             
-            rec_list = []
-            for date, row in recommendations.tail(10).iterrows():
-                rec_list.append({
-                    "date": date.strftime("%Y-%m-%d") if hasattr(date, 'strftime') else str(date),
-                    "firm": row.get("Firm", ""),
-                    "to_grade": row.get("To Grade", ""),
-                    "from_grade": row.get("From Grade", ""),
-                    "action": row.get("Action", "")
-                })
+            recent = recommendations.tail(10)
+            columns = {"date": format_dates(recent.index)}
+            for key, column in RECOMMENDATION_COLUMNS.items():
+                columns[key] = recent[column].fillna("").to_numpy() if column in recent else ""
+            rec_list = pd.DataFrame(columns).to_dict(orient="records")
             
             return {
                 "symbol": symbol.upper(),
@@ -158,6 +218,58 @@ class MCPStockTools:
             return {"error": str(e), "symbol": symbol}
 
     @staticmethod
+    def _batch_quotes(symbols: List[str]) -> pd.DataFrame:
+        """Get last price, change and volume for many symbols with a single bulk download.
+
+        Symbols trade on different calendars, so the last and previous closes are taken
+        per column from the last two non-missing daily bars rather than the last two rows.
+        """
+        frame = yf.download(
+            symbols,
+            period="5d",
+            interval="1d",
+            group_by="column",
+            auto_adjust=False,
+            progress=False,
+            threads=True
+        )
+        if frame is None or frame.empty:
+            return pd.DataFrame(columns=["price", "change", "change_percent", "volume"])
+        
+        close = frame["Close"]
+        volume = frame["Volume"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(symbols[0])
+            volume = volume.to_frame(symbols[0])
+        close = close.reindex(columns=symbols)
+        volume = volume.reindex(columns=symbols)
+        
+        values = close.to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        rows = np.arange(values.shape[0])[:, None]
+        cols = np.arange(values.shape[1])
+        
+        last_idx = np.where(valid, rows, -1).max(axis=0)
+        prev_idx = np.where(valid & (rows < last_idx), rows, -1).max(axis=0)
+        
+        last = np.where(last_idx >= 0, values[np.maximum(last_idx, 0), cols], np.nan)
+        prev = np.where(prev_idx >= 0, values[np.maximum(prev_idx, 0), cols], np.nan)
+        change = np.where(np.isnan(prev), 0.0, last - prev)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_pct = np.where(np.isnan(prev) | (prev == 0), 0.0, change / prev * 100)
+        last_volume = volume.to_numpy(dtype=float)[np.maximum(last_idx, 0), cols]
+        
+        quotes = pd.DataFrame({
+            "price": last,
+            "change": change,
+            "change_percent": change_pct,
+            "volume": np.nan_to_num(last_volume).astype("int64")
+        }, index=symbols)
+        quotes[["price", "change", "change_percent"]] = quotes[["price", "change", "change_percent"]].round(2)
+        return quotes[~np.isnan(last)]
+
+    @staticmethod
+    @cached("quote")
     def get_market_indices() -> List[Dict[str, Any]]:
         """Get major market indices data."""
         indices = {
@@ -171,72 +283,30 @@ class MCPStockTools:
             "^HSI": "Hang Seng"
         }
         
-        results = []
-        for symbol, name in indices.items():
-            try:
-                ticker = yf.Ticker(symbol)
-                info = ticker.info
-                hist = ticker.history(period="2d")
-                
-                current = info.get("regularMarketPrice", 0)
-                prev_close = info.get("previousClose", 0)
-                
-                if current and prev_close:
-                    change = current - prev_close
-                    change_pct = (change / prev_close) * 100
-                else:
-                    change = 0
-                    change_pct = 0
-                
-                results.append({
-                    "symbol": symbol,
-                    "name": name,
-                    "price": round(current, 2),
-                    "change": round(change, 2),
-                    "change_percent": round(change_pct, 2)
-                })
-            except Exception:
-                continue
+        try:
+            quotes = MCPStockTools._batch_quotes(list(indices))
+        except Exception as e:
+            return [{"error": str(e)}]
+        if quotes.empty:
+            return [{"error": "No index data available"}]
         
-        return results
+        quotes.insert(0, "name", quotes.index.map(indices))
+        quotes.insert(0, "symbol", quotes.index)
+        return quotes.drop(columns="volume").to_dict("records")
 
     @staticmethod
+    @cached("quote")
     def get_top_movers(market_type: str = "stocks", limit: int = 10) -> Dict[str, List[Dict]]:
         """Get top gainers and losers."""
         try:
-            if market_type == "etf":
-                symbols = ["SPY", "QQQ", "IWM", "DIA", "VTI", "VOO", "VEA", "VWO", "BND", "GLD", 
-                          "SLV", "USO", "XLF", "XLE", "XLK", "XLV", "XLI", "XLP", "XLU", "ARKK"]
-            else:
-                symbols = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "TSLA", "BRK-B", 
-                          "JPM", "JNJ", "V", "PG", "UNH", "HD", "MA", "DIS", "PYPL", "NFLX",
-                          "ADBE", "CRM", "INTC", "AMD", "CSCO", "PEP", "KO", "NKE", "MRK", "PFE"]
+            symbols = ETF_NAMES if market_type == "etf" else STOCK_NAMES
             
-            movers = []
-            for symbol in symbols:
-                try:
-                    ticker = yf.Ticker(symbol)
-                    info = ticker.info
-                    
-                    current = info.get("currentPrice", info.get("regularMarketPrice", 0))
-                    prev_close = info.get("previousClose", 0)
-                    
-                    if current and prev_close:
-                        change = current - prev_close
-                        change_pct = (change / prev_close) * 100
-                        
-                        movers.append({
-                            "symbol": symbol,
-                            "name": info.get("shortName", symbol),
-                            "price": round(current, 2),
-                            "change": round(change, 2),
-                            "change_percent": round(change_pct, 2),
-                            "volume": info.get("volume", 0)
-                        })
-                except Exception:
-                    continue
+            quotes = MCPStockTools._batch_quotes(list(symbols))
+            quotes = quotes[quotes["price"] > 0].sort_values("change_percent", ascending=False)
+            quotes.insert(0, "name", quotes.index.map(symbols))
+            quotes.insert(0, "symbol", quotes.index)
             
-            movers.sort(key=lambda x: x["change_percent"], reverse=True)
+            movers = quotes[["symbol", "name", "price", "change", "change_percent", "volume"]].to_dict("records")
             
             return {
                 "gainers": movers[:limit],
@@ -246,69 +316,55 @@ class MCPStockTools:
             return {"error": str(e), "gainers": [], "losers": []}
 
     @staticmethod
+    @cached("history")
     def analyze_stock_technicals(symbol: str) -> Dict[str, Any]:
         """Perform technical analysis on a stock."""
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period="6mo")
-            
-            if hist.empty:
+            values = indicator_engine.snapshot(symbol)
+            if values is None:
                 return {"error": "No data available", "symbol": symbol}
             
-            close_prices = hist["Close"]
-            
-            sma_20 = close_prices.rolling(window=20).mean().iloc[-1]
-            sma_50 = close_prices.rolling(window=50).mean().iloc[-1]
-            sma_200 = close_prices.rolling(window=200).mean().iloc[-1] if len(close_prices) >= 200 else None
-            
-            delta = close_prices.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs)).iloc[-1]
-            
-            exp1 = close_prices.ewm(span=12, adjust=False).mean()
-            exp2 = close_prices.ewm(span=26, adjust=False).mean()
-            macd = exp1 - exp2
-            signal = macd.ewm(span=9, adjust=False).mean()
-            macd_value = macd.iloc[-1]
-            signal_value = signal.iloc[-1]
-            
-            current_price = close_prices.iloc[-1]
+            current_price = values["current_price"]
+            rsi = values["rsi"]
             
             signals = []
-            if current_price > sma_20:
-                signals.append("Above 20-day SMA (Bullish)")
-            else:
-                signals.append("Below 20-day SMA (Bearish)")
-            
-            if current_price > sma_50:
-                signals.append("Above 50-day SMA (Bullish)")
-            else:
-                signals.append("Below 50-day SMA (Bearish)")
+            for window in (20, 50, 200):
+                sma = values[f"sma_{window}"]
+                if sma is None:
+                    continue
+                if current_price > sma:
+                    signals.append(f"Above {window}-day SMA (Bullish)")
+                else:
+                    signals.append(f"Below {window}-day SMA (Bearish)")
             
-            if rsi > 70:
-                signals.append("RSI Overbought")
-            elif rsi < 30:
-                signals.append("RSI Oversold")
-            else:
-                signals.append("RSI Neutral")
+            if rsi is not None:
+                if rsi > 70:
+                    signals.append("RSI Overbought")
+                elif rsi < 30:
+                    signals.append("RSI Oversold")
+                else:
+                    signals.append("RSI Neutral")
             
-            if macd_value > signal_value:
+            if values["macd"] > values["macd_signal"]:
                 signals.append("MACD Bullish Crossover")
             else:
                 signals.append("MACD Bearish Crossover")
             
+            def rounded(value):
+                return round(value, 2) if value is not None else None
+            
             return {
                 "symbol": symbol.upper(),
                 "current_price": round(current_price, 2),
-                "sma_20": round(sma_20, 2),
-                "sma_50": round(sma_50, 2),
-                "sma_200": round(sma_200, 2) if sma_200 else None,
-                "rsi": round(rsi, 2),
-                "macd": round(macd_value, 2),
-                "macd_signal": round(signal_value, 2),
+                "sma_20": rounded(values["sma_20"]),
+                "sma_50": rounded(values["sma_50"]),
+                "sma_200": rounded(values["sma_200"]),
+                "rsi": rounded(rsi),
+                "macd": round(values["macd"], 2),
+                "macd_signal": round(values["macd_signal"], 2),
                 "signals": signals,
+                "bars": values["bars"],
+                "as_of": values["as_of"],
                 "analysis_date": datetime.now().strftime("%Y-%m-%d %H:%M")
             }
         except Exception as e:
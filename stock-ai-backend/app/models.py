@@ -7,6 +7,7 @@ from enum import Enum
 class TriggerTime(str, Enum):
     MORNING = "morning"
     EVENING = "evening"
+    CUSTOM = "custom"
 
 
 class UserCreate(BaseModel):
@@ -35,13 +36,16 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     symbol: Optional[str] = None
-    conversation_history: Optional[List[ChatMessage]] = []
+    session_id: Optional[str] = None  # server-side session; omit to start one
+    conversation_history: Optional[List[ChatMessage]] = []  # seeds an unknown session; without session_id, legacy stateless mode
 
 
 class ChatResponse(BaseModel):
     response: str
     symbol: Optional[str] = None
-    data: Optional[dict] = None
+    data: Optional[dict] = None  # tool name -> every call made this turn ({arguments, result, reused})
+    usage: Optional[dict] = None  # tokens sent and received for this request
+    session_id: Optional[str] = None
 
 
 class StockQuery(BaseModel):
@@ -54,10 +58,21 @@ class MarketQuery(BaseModel):
     limit: int = 10
 
 
+class ScreenerRequest(BaseModel):
+    symbols: Optional[List[str]] = None
+    filter: Optional[str] = None
+    rank_by: str = "change_percent"
+    descending: bool = True
+    limit: int = Field(default=50, ge=1, le=1000)
+
+
 class SchedulerCreate(BaseModel):
     user_id: str
     prompt: str
     trigger_time: TriggerTime
+    cron: Optional[str] = None  # 5-field crontab expression, for custom schedules
+    time: Optional[str] = None  # HH:MM daily, for custom schedules without a cron expression
+    timezone: Optional[str] = None  # IANA name, e.g. "America/New_York"; defaults to the server's
     symbols: Optional[List[str]] = []
     is_active: bool = True
 
@@ -67,6 +82,8 @@ class SchedulerResponse(BaseModel):
     user_id: str
     prompt: str
     trigger_time: TriggerTime
+    cron: Optional[str] = None
+    timezone: Optional[str] = None
     symbols: List[str]
     is_active: bool
     created_at: datetime
@@ -0,0 +1,88 @@
+import os
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Optional
+from apscheduler.triggers.cron import CronTrigger
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Presets keep the original fixed times; "custom" schedulers carry their own cron expression.
+PRESET_CRONS = {
+    "morning": "30 8 * * *",
+    "evening": "0 17 * * *",
+}
+DEFAULT_TIMEZONE = os.getenv("SCHEDULER_TIMEZONE") or None  # None: the server's local zone
+SCHEDULE_FIELDS = ("trigger_time", "cron", "timezone", "is_active")
+
+_TIME = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+
+
+@lru_cache(maxsize=4096)
+def _trigger(expression: str, timezone: Optional[str]) -> CronTrigger:
+    try:
+        return CronTrigger.from_crontab(expression, timezone=timezone)
+    except (KeyError, LookupError) as e:
+        raise ValueError(f"Unknown timezone: {timezone}") from e
+
+
+def schedule_fields(trigger_time: str, cron: Optional[str] = None, time: Optional[str] = None,
+                    timezone: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """Validate a schedule and return the ``cron``/``timezone`` fields to store.
+
+    A custom schedule takes either a 5-field ``cron`` expression or a daily ``time`` (HH:MM).
+    Raises ValueError for anything that cannot be scheduled.
+    """
+    if trigger_time == "custom":
+        if not cron and time:
+            match = _TIME.match(time.strip())
+            if not match:
+                raise ValueError(f"Invalid time '{time}', expected HH:MM")
+            cron = f"{int(match.group(2))} {int(match.group(1))} * * *"
+        if not cron:
+            raise ValueError("A custom schedule needs a cron expression or a time")
+        cron = " ".join(cron.split())
+    elif trigger_time in PRESET_CRONS:
+        cron = None
+    else:
+        raise ValueError(f"Unknown trigger time: {trigger_time}")
+
+    # Presets fire at their fixed times in the server's schedule timezone for everyone.
+    timezone = (timezone or None) if trigger_time == "custom" else None
+    _trigger(cron or PRESET_CRONS[trigger_time], timezone or DEFAULT_TIMEZONE)
+    return {"cron": cron, "timezone": timezone}
+
+
+def schedule_changed(before: Dict, after: Dict) -> bool:
+    """Whether an edit changes when a scheduler fires (its schedule fields or active flag)."""
+    return any(before.get(field) != after.get(field) for field in SCHEDULE_FIELDS)
+
+
+def build_trigger(scheduler: Dict) -> CronTrigger:
+    trigger_time = scheduler.get("trigger_time")
+    if trigger_time == "custom":
+        expression, timezone = scheduler.get("cron"), scheduler.get("timezone")
+    else:
+        expression, timezone = PRESET_CRONS.get(trigger_time), None
+    if not expression:
+        raise ValueError(f"Scheduler {scheduler.get('id')} has no usable schedule")
+    return _trigger(expression, timezone or DEFAULT_TIMEZONE)
+
+
+def next_run_time(scheduler: Dict, after: Optional[datetime] = None) -> Optional[datetime]:
+    """First fire time strictly after ``after`` (default now), in the scheduler's timezone."""
+    trigger = build_trigger(scheduler)
+    after = after.astimezone(trigger.timezone) if after else datetime.now(trigger.timezone)
+    return trigger.get_next_fire_time(None, after + timedelta(microseconds=1))
+
+
+def next_run_timestamp(scheduler: Dict, after: Optional[float] = None) -> Optional[float]:
+    """Epoch seconds of the next fire time, or None for inactive or unschedulable schedulers."""
+    if not scheduler.get("is_active", True):
+        return None
+    try:
+        next_time = next_run_time(scheduler, datetime.fromtimestamp(after).astimezone() if after else None)
+    except ValueError:
+        return None
+    return next_time.timestamp() if next_time else None
@@ -1,13 +1,15 @@
 import os
-from datetime import datetime, time
+import time
+from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from typing import Optional
-from .database import get_active_schedulers_by_trigger, get_user_by_id
-from .ai_service import ai_analyst
-from .email_service import email_service
-from .mcp_tools import mcp_tools
-import json
+from apscheduler.triggers.interval import IntervalTrigger
+from typing import Dict, List, Optional
+from .database import advance_schedulers, find_due_schedulers, get_user_by_id
+from .alert_engine import alert_engine
+from .ai_refresher import ai_refresher
+from .leader import leader_lock
+from .schedule import PRESET_CRONS, next_run_time
 import asyncio
 
 
@@ -16,86 +18,108 @@ class SchedulerService:
     
     def __init__(self):
         self.scheduler: Optional[AsyncIOScheduler] = None
-        self.morning_hour = 8
-        self.morning_minute = 30
-        self.evening_hour = 17
-        self.evening_minute = 0
+        self.misfire_grace = float(os.getenv("SCHEDULER_MISFIRE_GRACE", "3600"))
+        self.election_interval = int(os.getenv("SCHEDULER_ELECTION_INTERVAL", "15"))
+        self.ai_refresh_tick = int(os.getenv("AI_REFRESH_TICK", "60"))
 
     def start(self):
-        """Start the scheduler with morning and evening jobs."""
+        """Start the scheduler.
+
+        Every worker process joins leader election and polls the shared job queue; only
+        the process holding the leader lock runs the dispatcher that enqueues due alerts.
+        """
         if self.scheduler is None:
             self.scheduler = AsyncIOScheduler()
-        
+
         self.scheduler.add_job(
-            self._run_morning_alerts,
-            CronTrigger(hour=self.morning_hour, minute=self.morning_minute),
-            id="morning_alerts",
+            self._coordinate,
+            IntervalTrigger(seconds=self.election_interval),
+            id="coordinate",
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
             replace_existing=True
         )
-        
         self.scheduler.add_job(
-            self._run_evening_alerts,
-            CronTrigger(hour=self.evening_hour, minute=self.evening_minute),
-            id="evening_alerts",
+            self._refresh_ai,
+            IntervalTrigger(seconds=self.ai_refresh_tick),
+            id="refresh_ai",
+            max_instances=1,
+            coalesce=True,
             replace_existing=True
         )
-        
+
         self.scheduler.start()
-        print(f"Scheduler started. Morning alerts at {self.morning_hour}:{self.morning_minute:02d}, Evening alerts at {self.evening_hour}:{self.evening_minute:02d}")
+        print(f"Scheduler started (election every {self.election_interval}s)")
+
+    @property
+    def is_leader(self) -> bool:
+        return leader_lock.is_leader
+
+    async def _coordinate(self):
+        """Take leadership if it is free, then join any unfinished alert runs."""
+        if not leader_lock.is_leader and leader_lock.try_acquire():
+            self._start_dispatcher()
+        try:
+            await alert_engine.poll_runs()
+        except Exception as e:
+            print(f"Error polling alert runs: {e}")
+
+    async def _refresh_ai(self):
+        """Keep precomputed AI summaries for the market and hot symbols current."""
+        try:
+            await ai_refresher.refresh_due()
+        except Exception as e:
+            print(f"Error refreshing AI summaries: {e}")
+
+    def _start_dispatcher(self):
+        self.scheduler.add_job(
+            self._dispatch_due,
+            CronTrigger(second=0),
+            id="dispatch_alerts",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        print(f"Became scheduler leader (pid {os.getpid()}); dispatching due alerts every minute")
 
-    def stop(self):
-        """Stop the scheduler."""
+    async def stop(self):
+        """Stop the scheduler and hand off leadership and this worker's shard."""
         if self.scheduler:
             self.scheduler.shutdown()
             self.scheduler = None
+        leader_lock.release()
+        try:
+            await alert_engine.leave()
+        except Exception as e:
+            print(f"Error leaving alert worker pool: {e}")
 
-    async def _run_morning_alerts(self):
-        """Execute all morning scheduled alerts."""
-        print(f"Running morning alerts at {datetime.now()}")
-        await self._process_alerts("morning")
+    async def _dispatch_due(self):
+        """Enqueue an alert run for every scheduler whose next fire time has passed.
 
-    async def _run_evening_alerts(self):
-        """Execute all evening scheduled alerts."""
-        print(f"Running evening alerts at {datetime.now()}")
-        await self._process_alerts("evening")
+        Runs are named after the minute the schedulers were due, and their jobs are
+        enqueued before the schedulers are advanced. If the process dies (or the enqueue
+        fails) in between, the next dispatch finds the same schedulers due again and the
+        queue's idempotency key keeps the re-enqueue from duplicating jobs. Fires missed
+        by more than the misfire grace (e.g. while no leader was running) are skipped.
+        """
+        now = time.time()
+        due = await asyncio.to_thread(find_due_schedulers, now)
+        if not due:
+            return
 
-    async def _process_alerts(self, trigger_time: str):
-        """Process all active alerts for the given trigger time."""
-        schedulers = get_active_schedulers_by_trigger(trigger_time)
-        
-        for scheduler in schedulers:
-            try:
-                user = get_user_by_id(scheduler["user_id"])
-                if not user:
-                    continue
-                
-                prompt = scheduler["prompt"]
-                symbols = scheduler.get("symbols", [])
-                
-                if symbols:
-                    analysis_parts = []
-                    for symbol in symbols:
-                        result = await ai_analyst.generate_stock_recommendation(symbol)
-                        if "error" not in result:
-                            analysis_parts.append(f"**{symbol}**\n{result.get('analysis', 'No analysis available')}")
-                    
-                    alert_content = f"Custom Prompt: {prompt}\n\n" + "\n\n---\n\n".join(analysis_parts)
-                else:
-                    market_summary = await ai_analyst.generate_market_summary()
-                    alert_content = f"Custom Prompt: {prompt}\n\n{market_summary.get('summary', 'No summary available')}"
-                
-                await email_service.send_market_alert(
-                    to_email=user["email"],
-                    user_name=user["name"],
-                    alert_content=alert_content,
-                    trigger_time=trigger_time,
-                    symbols=symbols
-                )
-                
-                print(f"Alert sent to {user['email']} for scheduler {scheduler['id']}")
-                
-            except Exception as e:
-                print(f"Error processing scheduler {scheduler['id']}: {str(e)}")
+        runs: Dict[str, List[Dict]] = {}
+        for scheduler, due_at in due:
+            if now - due_at > self.misfire_grace:
+                print(f"Skipping missed run of scheduler {scheduler['id']} due at {datetime.fromtimestamp(due_at)}")
+                continue
+            run_id = f"scheduled:{datetime.fromtimestamp(due_at).strftime('%Y-%m-%dT%H:%M')}"
+            runs.setdefault(run_id, []).append(scheduler)
+
+        for run_id, schedulers in runs.items():
+            print(f"Dispatching {len(schedulers)} alerts as run {run_id}")
+            await alert_engine.submit(run_id, "scheduled", schedulers)
+        await asyncio.to_thread(advance_schedulers, due, now)
 
     async def run_manual_alert(self, scheduler_id: str) -> dict:
         """Manually trigger an alert for testing."""
@@ -109,29 +133,9 @@ class SchedulerService:
         if not user:
             return {"error": "User not found"}
         
-        prompt = scheduler["prompt"]
-        symbols = scheduler.get("symbols", [])
-        
         try:
-            if symbols:
-                analysis_parts = []
-                for symbol in symbols:
-                    result = await ai_analyst.generate_stock_recommendation(symbol)
-                    if "error" not in result:
-                        analysis_parts.append(f"**{symbol}**\n{result.get('analysis', 'No analysis available')}")
-                
-                alert_content = f"Custom Prompt: {prompt}\n\n" + "\n\n---\n\n".join(analysis_parts)
-            else:
-                market_summary = await ai_analyst.generate_market_summary()
-                alert_content = f"Custom Prompt: {prompt}\n\n{market_summary.get('summary', 'No summary available')}"
-            
-            email_sent = await email_service.send_market_alert(
-                to_email=user["email"],
-                user_name=user["name"],
-                alert_content=alert_content,
-                trigger_time=scheduler["trigger_time"],
-                symbols=symbols
-            )
+            alert_content = await alert_engine.build_alert_content(scheduler)
+            email_sent = await alert_engine.send_alert(user, scheduler, alert_content)
             
             return {
                 "success": True,
@@ -141,22 +145,20 @@ class SchedulerService:
         except Exception as e:
             return {"error": str(e)}
 
+    @staticmethod
+    def next_run(scheduler: Dict) -> Optional[str]:
+        """Next fire time of a scheduler as ISO-8601 with its UTC offset, or None if paused."""
+        if not scheduler.get("is_active", True):
+            return None
+        try:
+            next_time = next_run_time(scheduler)
+        except ValueError:
+            return None
+        return next_time.isoformat() if next_time else None
+
     def get_next_run_times(self) -> dict:
-        """Get the next scheduled run times."""
-        now = datetime.now()
-        
-        morning_time = now.replace(hour=self.morning_hour, minute=self.morning_minute, second=0, microsecond=0)
-        if morning_time <= now:
-            morning_time = morning_time.replace(day=morning_time.day + 1)
-        
-        evening_time = now.replace(hour=self.evening_hour, minute=self.evening_minute, second=0, microsecond=0)
-        if evening_time <= now:
-            evening_time = evening_time.replace(day=evening_time.day + 1)
-        
-        return {
-            "morning": morning_time.isoformat(),
-            "evening": evening_time.isoformat()
-        }
+        """Get the next run times of the preset schedules."""
+        return {preset: self.next_run({"trigger_time": preset}) for preset in PRESET_CRONS}
 
 
 scheduler_service = SchedulerService()
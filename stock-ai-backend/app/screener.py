@@ -0,0 +1,265 @@
+import ast
+import os
+from functools import reduce
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from dotenv import load_dotenv
+from .cache import cached
+from .indicators import MACD_SPANS, RSI_PERIOD, SMA_WINDOWS
+from .mcp_tools import ETF_NAMES, STOCK_NAMES
+
+load_dotenv()
+
+SCREENER_LOOKBACK = os.getenv("SCREENER_LOOKBACK", os.getenv("TECHNICALS_LOOKBACK", "1y"))
+SCREENER_MAX_SYMBOLS = int(os.getenv("SCREENER_MAX_SYMBOLS", "1000"))
+MAX_EXPRESSION_LENGTH = 500
+
+FIELDS = {
+    "close": "Last close",
+    "change": "Change from the previous close",
+    "change_percent": "Percent change from the previous close",
+    "volume": "Last session volume",
+    "avg_volume": "20-day average volume",
+    **{f"sma_{window}": f"{window}-day simple moving average" for window in SMA_WINDOWS},
+    "rsi": f"{RSI_PERIOD}-day RSI (Wilder)",
+    "macd": "MACD line",
+    "macd_signal": "MACD signal line",
+    "macd_hist": "MACD histogram",
+    "high_52w": "52-week high close",
+    "low_52w": "52-week low close",
+}
+# "sma50" and "SMA_50" both resolve to "sma_50".
+_FIELD_ALIASES = {name.replace("_", ""): name for name in FIELDS}
+
+_COMPARISONS = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+    ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+_ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+Evaluator = Callable[[Dict[str, np.ndarray]], np.ndarray]
+
+
+def _compile_node(node: ast.AST) -> Evaluator:
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(value) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        # Pairwise so per-symbol arrays and constant (0-d) terms broadcast together.
+        return lambda f: reduce(combine, (np.asarray(part(f), dtype=bool) for part in parts))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda f: ~np.asarray(operand(f), dtype=bool)
+        if isinstance(node.op, ast.USub):
+            return lambda f: -operand(f)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+
+    if isinstance(node, ast.Compare):
+        terms = [_compile_node(node.left)] + [_compile_node(c) for c in node.comparators]
+        ops = []
+        for op in node.ops:
+            if type(op) not in _COMPARISONS:
+                raise ValueError(f"Unsupported comparison: {type(op).__name__}")
+            ops.append(_COMPARISONS[type(op)])
+        # Chained comparisons (10 < rsi < 30) hold only if every adjacent pair holds.
+        return lambda f: reduce(np.logical_and, (
+            op(terms[i](f), terms[i + 1](f)) for i, op in enumerate(ops)
+        ))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+        left, right, op = _compile_node(node.left), _compile_node(node.right), _ARITHMETIC[type(node.op)]
+        return lambda f: op(left(f), right(f))
+
+    if isinstance(node, ast.Name):
+        name = _FIELD_ALIASES.get(node.id.lower().replace("_", ""))
+        if name is None:
+            raise ValueError(f"Unknown field '{node.id}'. Available: {', '.join(FIELDS)}")
+        return lambda f: f[name]
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = float(node.value)
+        return lambda f: value
+
+    raise ValueError(f"Unsupported syntax in expression: {type(node).__name__}")
+
+
+def compile_expression(expression: str) -> Evaluator:
+    """Compile a filter or ranking expression over indicator fields.
+
+    Only field names, numbers, arithmetic, comparisons and ``and``/``or``/``not`` are
+    allowed; anything else raises ValueError. Comparisons with missing values are false.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}") from e
+    return _compile_node(tree.body)
+
+
+@cached("history")
+def _download_closes(symbols: Tuple[str, ...], period: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Daily closes and volumes as (dates x symbols) frames, from one bulk download.
+
+    Raises ValueError when the download returns no prices, so a failed fetch is not cached.
+    """
+    frame = yf.download(
+        list(symbols),
+        period=period,
+        interval="1d",
+        group_by="column",
+        auto_adjust=True,
+        progress=False,
+        threads=True
+    )
+    if frame is None or frame.empty:
+        raise ValueError("No price data returned for the screener universe")
+
+    close, volume = frame["Close"], frame["Volume"]
+    if isinstance(close, pd.Series):
+        close, volume = close.to_frame(symbols[0]), volume.to_frame(symbols[0])
+    close = close.reindex(columns=list(symbols)).dropna(how="all")
+    if close.empty:
+        raise ValueError("No price data returned for the screener universe")
+    volume = volume.reindex(index=close.index, columns=list(symbols))
+    return close, volume
+
+
+def compute_indicators(close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """Latest indicator values for every row of a (symbols x days) close matrix.
+
+    Interior gaps must already be forward-filled, so missing values only lead a row.
+    Moving averages and extremes are reductions over the trailing columns; RSI and the
+    MACD EMAs are one pass over the days, updating every symbol at once, with the same
+    seeding as the single-symbol indicator engine.
+    """
+    symbols, days = close.shape
+    bars = (~np.isnan(close)).sum(axis=1)
+    last = close[:, -1] if days else np.full(symbols, np.nan)
+    prev = close[:, -2] if days > 1 else np.full(symbols, np.nan)
+
+    fields: Dict[str, np.ndarray] = {
+        "close": last,
+        "change": last - prev,
+        "change_percent": (last - prev) / prev * 100,
+        "volume": volume[:, -1] if days else np.full(symbols, np.nan),
+    }
+    recent_volume = volume[:, -20:]
+    volume_days = (~np.isnan(recent_volume)).sum(axis=1)
+    fields["avg_volume"] = np.where(volume_days > 0, np.nansum(recent_volume, axis=1) / np.maximum(volume_days, 1), np.nan)
+
+    for window in SMA_WINDOWS:
+        fields[f"sma_{window}"] = np.where(bars >= window, close[:, -window:].mean(axis=1), np.nan)
+
+    year = close[:, -252:]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows for symbols without data
+        fields["high_52w"] = np.nanmax(year, axis=1) if days else np.full(symbols, np.nan)
+        fields["low_52w"] = np.nanmin(year, axis=1) if days else np.full(symbols, np.nan)
+
+    k_fast, k_slow, k_signal = (2 / (span + 1) for span in MACD_SPANS)
+    deltas = np.zeros(symbols, dtype=int)
+    avg_gain = np.zeros(symbols)
+    avg_loss = np.zeros(symbols)
+    ema_fast = np.full(symbols, np.nan)
+    ema_slow = np.full(symbols, np.nan)
+    signal = np.full(symbols, np.nan)
+    previous = np.full(symbols, np.nan)
+
+    for t in range(days):
+        price = close[:, t]
+        has = ~np.isnan(price)
+        step = has & ~np.isnan(previous)
+        change = np.where(step, price - previous, 0.0)
+        gain, loss = np.maximum(change, 0.0), np.maximum(-change, 0.0)
+        deltas += step
+        seeding = step & (deltas <= RSI_PERIOD)
+        smoothing = step & (deltas > RSI_PERIOD)
+        avg_gain = np.where(seeding, avg_gain + gain / RSI_PERIOD,
+                            np.where(smoothing, (avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD, avg_gain))
+        avg_loss = np.where(seeding, avg_loss + loss / RSI_PERIOD,
+                            np.where(smoothing, (avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD, avg_loss))
+
+        ema_fast = np.where(has, np.where(np.isnan(ema_fast), price, ema_fast + k_fast * (price - ema_fast)), ema_fast)
+        ema_slow = np.where(has, np.where(np.isnan(ema_slow), price, ema_slow + k_slow * (price - ema_slow)), ema_slow)
+        macd = ema_fast - ema_slow
+        signal = np.where(has, np.where(np.isnan(signal), macd, signal + k_signal * (macd - signal)), signal)
+        previous = np.where(has, price, previous)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), 100 - 100 / (1 + avg_gain / avg_loss))
+    fields["rsi"] = np.where(deltas >= RSI_PERIOD, rsi, np.nan)
+    fields["macd"] = ema_fast - ema_slow
+    fields["macd_signal"] = signal
+    fields["macd_hist"] = fields["macd"] - signal
+    return fields
+
+
+def _json_value(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def screen(symbols: Optional[List[str]] = None, filter_expression: Optional[str] = None,
+           rank_by: str = "change_percent", descending: bool = True, limit: int = 50) -> Dict[str, Any]:
+    """Evaluate a filter over a symbol universe and return matches ranked by ``rank_by``.
+
+    Raises ValueError for invalid expressions or an oversized universe.
+    """
+    names = {**STOCK_NAMES, **ETF_NAMES}
+    universe = list(dict.fromkeys(s.strip().upper() for s in (symbols or STOCK_NAMES) if s.strip()))
+    if len(universe) > SCREENER_MAX_SYMBOLS:
+        raise ValueError(f"Universe of {len(universe)} symbols exceeds the limit of {SCREENER_MAX_SYMBOLS}")
+    matches_filter = compile_expression(filter_expression) if filter_expression else None
+    rank = compile_expression(rank_by)
+
+    try:
+        close_frame, volume_frame = _download_closes(tuple(sorted(universe)), SCREENER_LOOKBACK)
+    except Exception as e:
+        return {"error": str(e), "results": []}
+    close_frame = close_frame.reindex(columns=universe).ffill()
+    volume_frame = volume_frame.reindex(index=close_frame.index, columns=universe)
+
+    close = close_frame.to_numpy(dtype=float).T
+    volume = volume_frame.to_numpy(dtype=float).T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fields = compute_indicators(close, volume)
+        has_data = ~np.isnan(fields["close"])
+        mask = has_data
+        if matches_filter:
+            selected = np.asarray(matches_filter(fields))
+            if selected.dtype != bool:
+                raise ValueError("Filter must be a condition, e.g. 'rsi < 30 and close > sma50'")
+            mask = has_data & selected
+        scores = np.broadcast_to(np.asarray(rank(fields), dtype=float), has_data.shape)
+
+    matched = np.flatnonzero(mask)
+    # NaN scores sort last in either direction.
+    ordered = matched[np.argsort(np.where(np.isnan(scores[matched]), np.inf,
+                                          -scores[matched] if descending else scores[matched]), kind="stable")]
+
+    results = []
+    for position, i in enumerate(ordered[:limit], start=1):
+        row = {"rank": position, "symbol": universe[i], "name": names.get(universe[i], universe[i]),
+               "score": _json_value(scores[i], 4)}
+        for name, values in fields.items():
+            row[name] = _json_value(values[i])
+        row["volume"] = int(row["volume"]) if row["volume"] is not None else None
+        row["avg_volume"] = int(row["avg_volume"]) if row["avg_volume"] is not None else None
+        results.append(row)
+
+    return {
+        "universe_size": len(universe),
+        "evaluated": int(has_data.sum()),
+        "matched": int(mask.sum()),
+        "filter": filter_expression,
+        "rank_by": rank_by,
+        "descending": descending,
+        "as_of": close_frame.index[-1].strftime("%Y-%m-%d") if len(close_frame.index) else None,
+        "results": results
+    }
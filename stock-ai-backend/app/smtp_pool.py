@@ -0,0 +1,175 @@
+import asyncio
+import time
+from email.message import Message
+from typing import Any, Dict, List, Optional
+import aiosmtplib
+
+
+class RateLimiter:
+    """Spaces operations evenly so no more than ``rate`` happen per second (0 disables)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class SMTPPool:
+    """Bounded pool of long-lived SMTP connections fed by a rate-limited outbound queue.
+
+    Each worker owns one connection, opened (with STARTTLS and AUTH when configured)
+    on first use and reused for every message it sends. A dropped or stale connection
+    is reopened and the message retried with backoff.
+    """
+
+    RECONNECT_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError,
+                        aiosmtplib.SMTPTimeoutError, ConnectionError, OSError)
+
+    def __init__(self, hostname: str, port: int, username: str = "", password: str = "",
+                 start_tls: Optional[bool] = True, size: int = 4, rate_per_second: float = 0,
+                 queue_size: int = 1000, max_retries: int = 3, idle_timeout: float = 60,
+                 timeout: float = 30):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.size = size
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.rate_limiter = RateLimiter(rate_per_second)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._metrics = {
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "abandoned": 0,
+            "connections_opened": 0,
+            "send_seconds_total": 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.size)]
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await smtp.connect()
+        self._metrics["connections_opened"] += 1
+        return smtp
+
+    @staticmethod
+    async def _disconnect(smtp: Optional[aiosmtplib.SMTP]):
+        if smtp is None:
+            return
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _worker(self, index: int):
+        smtp: Optional[aiosmtplib.SMTP] = None
+        last_used = 0.0
+        try:
+            while True:
+                message, future = await self._queue.get()
+                try:
+                    if future.done():
+                        # The sender stopped waiting (cancelled or past its deadline) and its
+                        # job will be retried; delivering now would send the message twice.
+                        self._metrics["abandoned"] += 1
+                        continue
+
+                    if smtp is not None and time.monotonic() - last_used > self.idle_timeout:
+                        await self._disconnect(smtp)
+                        smtp = None
+
+                    await self.rate_limiter.acquire()
+                    if future.done():  # gave up while waiting for a rate slot
+                        self._metrics["abandoned"] += 1
+                        continue
+                    started = time.monotonic()
+                    attempt = 0
+                    while True:
+                        try:
+                            if smtp is None or not smtp.is_connected:
+                                smtp = await self._connect()
+                            await smtp.send_message(message)
+                            break
+                        except self.RECONNECT_ERRORS:
+                            await self._disconnect(smtp)
+                            smtp = None
+                            attempt += 1
+                            if attempt > self.max_retries:
+                                raise
+                            self._metrics["retries"] += 1
+                            await asyncio.sleep(min(2 ** (attempt - 1), 10))
+
+                    last_used = time.monotonic()
+                    self._metrics["sent"] += 1
+                    self._metrics["send_seconds_total"] += last_used - started
+                    if not future.done():
+                        future.set_result(True)
+                except asyncio.CancelledError:
+                    if not future.done():
+                        future.cancel()
+                    raise
+                except Exception as e:
+                    self._metrics["failed"] += 1
+                    if not future.done():
+                        future.set_exception(e)
+                finally:
+                    self._queue.task_done()
+        finally:
+            await self._disconnect(smtp)
+
+    async def send(self, message: Message) -> bool:
+        """Queue a message and wait until a pooled connection has delivered it."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, future))
+        return await future
+
+    async def close(self):
+        """Stop the workers and quit their connections."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        sent = self._metrics["sent"]
+        return {
+            "sent": sent,
+            "failed": self._metrics["failed"],
+            "retries": self._metrics["retries"],
+            "abandoned": self._metrics["abandoned"],
+            "connections_opened": self._metrics["connections_opened"],
+            "pool_size": self.size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "avg_send_seconds": round(self._metrics["send_seconds_total"] / sent, 4) if sent else 0.0,
+        }
@@ -0,0 +1,202 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a characters-per-token estimate
+    tiktoken = None
+
+load_dotenv()
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4  # role and separators per chat message
+SUMMARY_LINE_CHARS = 160
+SUMMARY_HEADER = "Earlier in this conversation (condensed):\n"
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:  # encodings are downloaded on first use and may be unavailable offline
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def message_tokens(message: Dict[str, Any], model: str = "gpt-4o") -> int:
+    tokens = MESSAGE_OVERHEAD + count_tokens(message.get("content") or "", model)
+    for call in message.get("tool_calls") or []:
+        function = call.get("function", {})
+        tokens += count_tokens(function.get("name", "") + function.get("arguments", ""), model)
+    return tokens
+
+
+def _evenly_spaced(count: int, points: int) -> List[int]:
+    """``points`` indexes spread over ``range(count)``, always keeping the first and last."""
+    if count <= points:
+        return list(range(count))
+    step = (count - 1) / (points - 1)
+    return sorted({round(i * step) for i in range(points)})
+
+
+def downsample_history(result: Dict[str, Any], points: int) -> Dict[str, Any]:
+    """Thin a ``get_historical_data`` result (records or columns) to about ``points`` bars."""
+    data = result.get("data")
+    if isinstance(data, list):
+        count = len(data)
+        thinned = [data[i] for i in _evenly_spaced(count, points)]
+    elif isinstance(data, dict) and data:
+        count = len(next(iter(data.values())))
+        keep = _evenly_spaced(count, points)
+        thinned = {field: [values[i] for i in keep] for field, values in data.items()}
+    else:
+        return result
+    if count <= points:
+        return result
+    return {**result, "data": thinned, "downsampled_from": count}
+
+
+def _shrink(value: Any, max_items: int, max_chars: int) -> Any:
+    """Keep the first ``max_items`` of every list and the first ``max_chars`` of every string."""
+    if isinstance(value, dict):
+        return {k: _shrink(v, max_items, max_chars) for k, v in value.items()}
+    if isinstance(value, list):
+        shrunk = [_shrink(v, max_items, max_chars) for v in value[:max_items]]
+        return shrunk + [f"... {len(value) - max_items} more"] if len(value) > max_items else shrunk
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "..."
+    return value
+
+
+class TokenBudget:
+    """Keeps chat prompts within a token budget.
+
+    Older conversation turns beyond ``history_tokens`` are condensed into a one-line-per-turn
+    summary, tool results are compacted to ``tool_result_tokens`` each (price history is
+    downsampled to ``history_points`` bars first), and ``enforce`` trims the assembled
+    prompt to ``max_context_tokens`` before every model call. Token counts use tiktoken when
+    it is installed and a characters/4 estimate otherwise.
+    """
+
+    def __init__(self, max_context_tokens: int = 12000, history_tokens: int = 3000,
+                 tool_result_tokens: int = 2000, history_points: int = 60, model: str = "gpt-4o"):
+        self.max_context_tokens = max_context_tokens
+        self.history_tokens = history_tokens
+        self.tool_result_tokens = tool_result_tokens
+        self.history_points = history_points
+        self.model = model
+
+    @property
+    def counter(self) -> str:
+        return "tiktoken" if _encoding(self.model) is not None else "estimate"
+
+    def tokens(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(message_tokens(message, self.model) for message in messages)
+
+    def fit_history(self, history: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """The most recent turns that fit ``history_tokens``, preceded by a summary of the rest.
+
+        Returns the messages to send and how many turns were condensed.
+        """
+        kept, used = [], 0
+        for message in reversed(history):
+            tokens = message_tokens(message, self.model)
+            if used + tokens > self.history_tokens:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+        dropped = history[:len(history) - len(kept)]
+        if not dropped:
+            return kept, 0
+
+        summary = self.summary_message(self.condense(dropped, self.history_tokens // 4))
+        return [summary] + kept, len(dropped)
+
+    def condense(self, messages: List[Dict[str, Any]], max_tokens: int) -> List[str]:
+        """One line per message, newest kept first when ``max_tokens`` runs out; in chronological order."""
+        lines, used = [], 0
+        for message in reversed(messages):
+            text = " ".join((message.get("content") or "").split())
+            line = f"- {message.get('role', 'user')}: {text[:SUMMARY_LINE_CHARS]}{'...' if len(text) > SUMMARY_LINE_CHARS else ''}"
+            used += count_tokens(line, self.model)
+            if used > max_tokens:
+                break
+            lines.append(line)
+        return lines[::-1]
+
+    @staticmethod
+    def summary_message(lines: List[str]) -> Dict[str, str]:
+        return {"role": "system", "content": SUMMARY_HEADER + "\n".join(lines)}
+
+    def tool_content(self, tool_name: str, result: Any, limit: Optional[int] = None) -> str:
+        """Compact JSON for a tool result, cut down until it fits ``limit`` tokens."""
+        limit = limit or self.tool_result_tokens
+        if tool_name == "get_historical_data" and isinstance(result, dict):
+            result = downsample_history(result, self.history_points)
+
+        content = json.dumps(result, separators=(",", ":"), default=str)
+        max_items, max_chars = 20, 500
+        while count_tokens(content, self.model) > limit and max_items > 1:
+            content = json.dumps(_shrink(result, max_items, max_chars), separators=(",", ":"), default=str)
+            max_items, max_chars = max_items // 2, max(max_chars // 2, 40)
+        if count_tokens(content, self.model) > limit:
+            content = content[:limit * CHARS_PER_TOKEN] + "... [truncated]"
+        return content
+
+    def _recompact(self, content: str, limit: int) -> str:
+        try:
+            return self.tool_content("", json.loads(content), limit)
+        except ValueError:
+            return content[:limit * CHARS_PER_TOKEN] + "... [truncated]"
+
+    def enforce(self, messages: List[Dict[str, Any]], current_turn: int) -> Tuple[int, int]:
+        """Trim ``messages`` in place to the context budget.
+
+        Tool results are compacted oldest first, then history before ``current_turn`` (the
+        index of the user's new message) is dropped oldest first. The system prompt and the
+        current turn are never removed. Returns the token count and how many messages were dropped.
+        """
+        total = self.tokens(messages)
+        if total <= self.max_context_tokens:
+            return total, 0
+
+        compact_limit = max(self.tool_result_tokens // 4, 100)
+        for message in messages:
+            if total <= self.max_context_tokens:
+                break
+            before = message_tokens(message, self.model)
+            if message["role"] != "tool" or before <= compact_limit + MESSAGE_OVERHEAD:
+                continue
+            message["content"] = self._recompact(message["content"], compact_limit)
+            total += message_tokens(message, self.model) - before
+
+        dropped = 0
+        while total > self.max_context_tokens and dropped < current_turn - 1:
+            total -= message_tokens(messages.pop(1), self.model)
+            dropped += 1
+        return total, dropped
+
+
+chat_budget = TokenBudget(
+    max_context_tokens=int(os.getenv("CHAT_MAX_CONTEXT_TOKENS", "12000")),
+    history_tokens=int(os.getenv("CHAT_HISTORY_TOKENS", "3000")),
+    tool_result_tokens=int(os.getenv("CHAT_TOOL_RESULT_TOKENS", "2000")),
+    history_points=int(os.getenv("CHAT_HISTORY_POINTS", "60"))
+)
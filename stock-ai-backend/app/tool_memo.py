@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from .cache import is_error_result, make_key
+
+load_dotenv()
+
+_QUOTE_TTL = float(os.getenv("TOOL_MEMO_QUOTE_TTL", "30"))
+_HISTORY_TTL = float(os.getenv("TOOL_MEMO_HISTORY_TTL", "120"))
+_NEWS_TTL = float(os.getenv("TOOL_MEMO_NEWS_TTL", "300"))
+_FUNDAMENTALS_TTL = float(os.getenv("TOOL_MEMO_FUNDAMENTALS_TTL", "1800"))
+
+# Seconds a chat tool result may be reused, by how quickly the underlying data moves.
+TOOL_TTLS = {
+    "get_stock_info": _QUOTE_TTL,
+    "get_market_indices": _QUOTE_TTL,
+    "get_top_movers": _QUOTE_TTL,
+    "get_historical_data": _HISTORY_TTL,
+    "analyze_stock_technicals": _HISTORY_TTL,
+    "get_stock_news": _NEWS_TTL,
+    "get_recommendations": _FUNDAMENTALS_TTL,
+    "get_financials": _FUNDAMENTALS_TTL,
+}
+
+
+class ToolMemo:
+    """Tool results of one chat request or session, keyed by tool name and canonical arguments.
+
+    Arguments are bound to the tool's signature with defaults applied and the symbol
+    upper-cased, so ``{"symbol": "aapl"}`` and ``{"symbol": "AAPL", "period": "1mo"}``
+    share an entry. Results expire after the tool's TTL; errors are never kept. A call
+    issued while the same call is still running waits for it instead of running again.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, default_ttl: float = _QUOTE_TTL):
+        self.ttls = TOOL_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self._entries: Dict[Tuple, Tuple[float, Any, int]] = {}
+        self._pending: Dict[Tuple, asyncio.Future] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tool_name: str, func: Callable, arguments: Dict[str, Any]) -> Tuple:
+        return (tool_name,) + make_key(func, (), arguments)[0]
+
+    def _lookup(self, key: Tuple) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, result, size = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.size -= size
+            return False, None
+        return True, result
+
+    async def run(self, key: Tuple, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return ``(result, reused)``, awaiting ``call`` only if no live result exists."""
+        hit, result = self._lookup(key)
+        if hit:
+            self.hits += 1
+            return result, True
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending), True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            result = await call()
+            if not is_error_result(result):
+                size = len(json.dumps(result, default=str))
+                self._entries[key] = (time.time() + self.ttls.get(key[0], self.default_ttl), result, size)
+                self.size += size
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    def purge(self):
+        """Drop expired results."""
+        now = time.time()
+        for key in [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]:
+            self.size -= self._entries.pop(key)[2]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
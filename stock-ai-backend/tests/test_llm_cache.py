@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import app.llm_cache as llm_cache_module
+from app.llm_cache import LLMResponseCache
+
+
+def _technicals(analysis_date: str) -> dict:
+    return {
+        "symbol": "AAPL",
+        "current_price": 187.42,
+        "rsi": 41.3,
+        "signals": ["RSI Neutral", "MACD Bullish Crossover"],
+        "as_of": "2026-10-16",
+        "analysis_date": analysis_date,
+    }
+
+
+def test_unchanged_data_minutes_apart_hits_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache_module, "is_market_open", lambda: False)
+    monkeypatch.setattr(llm_cache_module, "seconds_until_open", lambda: 6 * 3600)
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"))
+    calls = []
+
+    async def create() -> str:
+        calls.append(1)
+        return "HOLD"
+
+    async def lookup(analysis_date: str):
+        payload = {"symbol": "AAPL", "technicals": _technicals(analysis_date)}
+        key = cache.fingerprint("gpt-4o", "system", "stock_analysis", payload)
+        return await cache.get_or_create(key, "stock_analysis", create)
+
+    try:
+        first = asyncio.run(lookup("2026-10-17 18:02"))
+        later = time.time() + 7 * 60
+        monkeypatch.setattr(llm_cache_module.time, "time", lambda: later)
+        second = asyncio.run(lookup("2026-10-17 18:09"))
+    finally:
+        cache.close()
+
+    assert first == ("HOLD", False)
+    assert second == ("HOLD", True)
+    assert len(calls) == 1
+
+
+def test_changed_data_misses_cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"))
+    base = _technicals("2026-10-17 18:02")
+    moved = {**base, "current_price": 201.0}
+    try:
+        assert (cache.fingerprint("gpt-4o", "system", "stock_analysis", base)
+                != cache.fingerprint("gpt-4o", "system", "stock_analysis", moved))
+    finally:
+        cache.close()
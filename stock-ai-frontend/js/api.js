@@ -65,13 +65,69 @@ class API {
         register: (name, email, password) => API.post(CONFIG.ENDPOINTS.AUTH.REGISTER, { name, email, password })
     };
     
+    static async stream(endpoint, data, onEvent) {
+        const url = `${CONFIG.API_BASE_URL}${endpoint}`;
+        
+        const headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        };
+        
+        if (CONFIG.API_AUTH) {
+            headers['Authorization'] = CONFIG.API_AUTH;
+        }
+        
+        const response = await fetch(url, {
+            method: 'POST',
+            headers,
+            body: JSON.stringify(data)
+        });
+        
+        if (!response.ok || !response.body) {
+            const error = await response.json().catch(() => ({ detail: 'Request failed' }));
+            throw new Error(error.detail || `HTTP ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const frames = buffer.split('\n\n');
+            buffer = frames.pop();
+            
+            for (const frame of frames) {
+                let event = 'message';
+                let payload = '';
+                for (const line of frame.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) payload += line.slice(6);
+                }
+                if (payload) onEvent(event, JSON.parse(payload));
+            }
+        }
+    }
+    
     static chat = {
-        send: (message, symbol = null, conversationHistory = []) => 
+        send: (message, symbol = null, sessionId = null, history = []) => 
             API.post(CONFIG.ENDPOINTS.CHAT, { 
                 message, 
                 symbol, 
-                conversation_history: conversationHistory 
-            })
+                session_id: sessionId,
+                conversation_history: history
+            }),
+        stream: (message, symbol = null, sessionId = null, history = [], onEvent = () => {}) =>
+            API.stream(CONFIG.ENDPOINTS.CHAT_STREAM, {
+                message,
+                symbol,
+                session_id: sessionId,
+                conversation_history: history
+            }, onEvent),
+        endSession: (sessionId) => API.delete(CONFIG.ENDPOINTS.CHAT_SESSION(sessionId))
     };
     
     static market = {
@@ -84,8 +140,8 @@ class API {
     
     static stocks = {
         getInfo: (symbol) => API.get(CONFIG.ENDPOINTS.STOCKS.INFO(symbol)),
-        getHistory: (symbol, period = '1mo', interval = '1d') => 
-            API.get(`${CONFIG.ENDPOINTS.STOCKS.HISTORY(symbol)}?period=${period}&interval=${interval}`),
+        getHistory: (symbol, period = '1mo', interval = '1d', format = 'records') => 
+            API.get(`${CONFIG.ENDPOINTS.STOCKS.HISTORY(symbol)}?period=${period}&interval=${interval}&format=${format}`),
         getNews: (symbol) => API.get(CONFIG.ENDPOINTS.STOCKS.NEWS(symbol)),
         getTechnicals: (symbol) => API.get(CONFIG.ENDPOINTS.STOCKS.TECHNICALS(symbol)),
         getFinancials: (symbol) => API.get(CONFIG.ENDPOINTS.STOCKS.FINANCIALS(symbol)),
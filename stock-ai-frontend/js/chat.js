@@ -1,5 +1,8 @@
 class Chat {
-    static conversationHistory = [];
+    static sessionId = null;
+    // Recent turns, sent along so a worker that doesn't hold the session can rebuild it.
+    static history = [];
+    static maxHistory = 20;
     static currentSymbol = null;
     
     static init() {
@@ -169,16 +172,40 @@ class Chat {
         
         this.showTypingIndicator();
         
+        let streamed = '';
+        let messageDiv = null;
+        let finalResponse = null;
+        
         try {
-            const response = await API.chat.send(message, symbol, this.conversationHistory);
+            await API.chat.stream(message, symbol, this.sessionId, this.history, (event, data) => {
+                if (event === 'tool_start') {
+                    this.setTypingStatus(`Fetching ${data.name.replace(/_/g, ' ')}...`);
+                } else if (event === 'token') {
+                    if (!messageDiv) {
+                        this.hideTypingIndicator();
+                        messageDiv = this.addMessage('assistant', '');
+                    }
+                    streamed += data.content;
+                    this.updateMessage(messageDiv, streamed);
+                } else if (event === 'done' || event === 'error') {
+                    finalResponse = data.response;
+                    if (data.session_id) this.sessionId = data.session_id;
+                }
+            });
             
             this.hideTypingIndicator();
             
-            this.conversationHistory.push({ role: 'user', content: message });
-            this.conversationHistory.push({ role: 'assistant', content: response.response });
-            
-            this.addMessage('assistant', response.response);
-            
+            const content = finalResponse ?? streamed;
+            this.history = [
+                ...this.history,
+                { role: 'user', content: message },
+                { role: 'assistant', content }
+            ].slice(-this.maxHistory);
+            if (messageDiv) {
+                this.updateMessage(messageDiv, content);
+            } else {
+                this.addMessage('assistant', content);
+            }
         } catch (error) {
             this.hideTypingIndicator();
             this.addMessage('assistant', `Sorry, I encountered an error: ${error.message}. Please make sure the backend is running and the OpenAI API key is configured.`);
@@ -198,6 +225,25 @@ class Chat {
         
         messagesContainer.appendChild(messageDiv);
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        return messageDiv;
+    }
+    
+    static updateMessage(messageDiv, content) {
+        const messagesContainer = document.getElementById('chatMessages');
+        messageDiv.innerHTML = `<div class="markdown-content">${this.formatMarkdown(content)}</div>`;
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+    
+    static setTypingStatus(text) {
+        const indicator = document.getElementById('typingIndicator');
+        if (!indicator) return;
+        let status = indicator.querySelector('.typing-status');
+        if (!status) {
+            status = document.createElement('small');
+            status.className = 'typing-status text-muted ms-2';
+            indicator.appendChild(status);
+        }
+        status.textContent = text;
     }
     
     static showTypingIndicator() {
@@ -222,7 +268,11 @@ class Chat {
     }
     
     static clearChat() {
-        this.conversationHistory = [];
+        if (this.sessionId) {
+            API.chat.endSession(this.sessionId).catch(() => {});
+            this.sessionId = null;
+        }
+        this.history = [];
         const messagesContainer = document.getElementById('chatMessages');
         messagesContainer.innerHTML = `
             <div class="message assistant">
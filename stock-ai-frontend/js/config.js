@@ -7,6 +7,8 @@ const CONFIG = {
             REGISTER: '/api/auth/register'
         },
         CHAT: '/api/chat',
+        CHAT_STREAM: '/api/chat/stream',
+        CHAT_SESSION: (id) => `/api/chat/sessions/${id}`,
         MARKET: {
             SUMMARY: '/api/market/summary',
             AI_SUMMARY: '/api/market/ai-summary',
@@ -124,7 +124,7 @@ class Dashboard {
     static renderIndices(indices) {
         const container = document.getElementById('indicesContainer');
         
-        if (!indices || indices.length === 0) {
+        if (!indices || indices.length === 0 || indices[0].error) {
             container.innerHTML = '<div class="col-12 text-center text-muted">No index data available</div>';
             return;
         }
@@ -202,6 +202,7 @@ class Dashboard {
                 <div class="markdown-content">
                     ${this.formatMarkdown(data.summary)}
                 </div>
+                ${data.generated_at ? `<small class="text-muted">Generated ${new Date(data.generated_at).toLocaleTimeString()}</small>` : ''}
             `;
         } catch (error) {
             console.error('Failed to load AI summary:', error);
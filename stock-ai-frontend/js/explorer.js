@@ -171,7 +171,7 @@ class Explorer {
         try {
             const [info, history, technicals, news] = await Promise.all([
                 API.stocks.getInfo(symbol),
-                API.stocks.getHistory(symbol, '3mo', '1d'),
+                API.stocks.getHistory(symbol, '3mo', '1d', 'columns'),
                 API.stocks.getTechnicals(symbol),
                 API.stocks.getNews(symbol)
             ]);
@@ -386,7 +386,7 @@ class Explorer {
                 document.querySelectorAll('#periodSelector button').forEach(b => b.classList.remove('active'));
                 btn.classList.add('active');
                 
-                const history = await API.stocks.getHistory(this.currentSymbol, btn.dataset.period, '1d');
+                const history = await API.stocks.getHistory(this.currentSymbol, btn.dataset.period, '1d', 'columns');
                 this.renderPriceChart(history);
             });
         });
@@ -403,9 +403,10 @@ class Explorer {
             this.priceChart.destroy();
         }
         
-        const data = history.data || [];
-        const labels = data.map(d => d.date);
-        const prices = data.map(d => d.close);
+        // Columnar history: the date and close arrays feed the chart as-is.
+        const data = history.data || {};
+        const labels = data.date || [];
+        const prices = data.close || [];
         
         const isPositive = prices.length > 1 && prices[prices.length - 1] >= prices[0];
         const color = isPositive ? 'rgb(25, 135, 84)' : 'rgb(220, 53, 69)';
@@ -484,6 +485,7 @@ class Explorer {
                 <div class="markdown-content" style="max-height: 300px; overflow-y: auto;">
                     ${this.formatMarkdown(analysis.analysis)}
                 </div>
+                ${analysis.generated_at ? `<small class="text-muted">Generated ${new Date(analysis.generated_at).toLocaleTimeString()}</small>` : ''}
             `;
         } catch (error) {
             container.innerHTML = `
@@ -17,7 +17,7 @@ class Scheduler {
             <div class="row mb-4">
                 <div class="col-12">
                     <h2 class="mb-3"><i class="bi bi-clock me-2"></i>Alert Scheduler</h2>
-                    <p class="text-muted">Set up automated stock alerts for morning pre-market and evening post-market updates</p>
+                    <p class="text-muted">Set up automated stock alerts for pre-market, post-market or any time of day</p>
                 </div>
             </div>
             
@@ -43,6 +43,10 @@ class Scheduler {
                                 <strong><i class="bi bi-sunset me-2 text-info"></i>Evening Alert</strong>
                                 <p class="text-muted small mb-0">Sent at 5:00 PM (after market close)</p>
                             </div>
+                            <div class="mt-3">
+                                <strong><i class="bi bi-clock me-2 text-primary"></i>Custom Alert</strong>
+                                <p class="text-muted small mb-0">Any time of day or cron expression, in your timezone (${this.timezone()})</p>
+                            </div>
                             <hr>
                             <div id="nextRunsInfo">
                                 <small class="text-muted">Loading next run times...</small>
@@ -68,7 +72,24 @@ class Scheduler {
                                         <label class="btn btn-outline-info" for="triggerEvening">
                                             <i class="bi bi-sunset me-1"></i>Evening
                                         </label>
+                                        <input type="radio" class="btn-check" name="triggerTime" id="triggerCustom" value="custom" ${!isLoggedIn ? 'disabled' : ''}>
+                                        <label class="btn btn-outline-primary" for="triggerCustom">
+                                            <i class="bi bi-clock me-1"></i>Custom
+                                        </label>
+                                    </div>
+                                </div>
+                                <div class="mb-3 d-none" id="customScheduleFields">
+                                    <div class="row g-2">
+                                        <div class="col-md-4">
+                                            <label class="form-label">Time</label>
+                                            <input type="time" class="form-control" id="schedulerTime" value="09:00">
+                                        </div>
+                                        <div class="col-md-8">
+                                            <label class="form-label">Cron expression (optional)</label>
+                                            <input type="text" class="form-control" id="schedulerCron" placeholder="e.g., 0 12 * * 1-5 (overrides time)">
+                                        </div>
                                     </div>
+                                    <small class="text-muted">Times are in ${this.timezone()}</small>
                                 </div>
                                 <div class="mb-3">
                                     <label class="form-label">Symbols (optional)</label>
@@ -120,7 +141,25 @@ class Scheduler {
         this.loadNextRuns();
     }
     
+    static timezone() {
+        return Intl.DateTimeFormat().resolvedOptions().timeZone;
+    }
+    
+    static triggerLabel(scheduler) {
+        if (scheduler.trigger_time !== 'custom') {
+            return scheduler.trigger_time.charAt(0).toUpperCase() + scheduler.trigger_time.slice(1);
+        }
+        return scheduler.cron || 'Custom';
+    }
+    
     static setupEventListeners() {
+        document.querySelectorAll('input[name="triggerTime"]').forEach(input => {
+            input.addEventListener('change', () => {
+                const custom = document.getElementById('triggerCustom').checked;
+                document.getElementById('customScheduleFields').classList.toggle('d-none', !custom);
+            });
+        });
+        
         document.getElementById('createSchedulerForm').addEventListener('submit', (e) => {
             e.preventDefault();
             if (Auth.requireAuth()) {
@@ -200,9 +239,9 @@ class Scheduler {
                         <div class="card scheduler-card ${scheduler.trigger_time}">
                             <div class="card-body">
                                 <div class="d-flex justify-content-between align-items-start mb-2">
-                                    <span class="trigger-badge badge ${scheduler.trigger_time === 'morning' ? 'bg-warning' : 'bg-info'}">
-                                        <i class="bi bi-${scheduler.trigger_time === 'morning' ? 'sunrise' : 'sunset'} me-1"></i>
-                                        ${scheduler.trigger_time.charAt(0).toUpperCase() + scheduler.trigger_time.slice(1)}
+                                    <span class="trigger-badge badge ${{ morning: 'bg-warning', evening: 'bg-info' }[scheduler.trigger_time] || 'bg-primary'}">
+                                        <i class="bi bi-${{ morning: 'sunrise', evening: 'sunset' }[scheduler.trigger_time] || 'clock'} me-1"></i>
+                                        ${this.triggerLabel(scheduler)}
                                     </span>
                                     <div class="form-check form-switch">
                                         <input class="form-check-input" type="checkbox" 
@@ -254,10 +293,23 @@ class Scheduler {
             .map(s => s.trim().toUpperCase())
             .filter(s => s.length > 0);
         
+        // Presets fire at fixed server times; only custom schedules follow the browser's timezone.
+        const schedule = {};
+        if (triggerTime === 'custom') {
+            schedule.timezone = this.timezone();
+            const cron = document.getElementById('schedulerCron').value.trim();
+            if (cron) {
+                schedule.cron = cron;
+            } else {
+                schedule.time = document.getElementById('schedulerTime').value;
+            }
+        }
+        
         try {
             await API.scheduler.create({
                 user_id: Auth.getUserId(),
                 trigger_time: triggerTime,
+                ...schedule,
                 symbols: symbols,
                 prompt: prompt || 'Provide a comprehensive market analysis',
                 is_active: true